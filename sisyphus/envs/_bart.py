@@ -36,47 +36,91 @@ class BART(GraphWorld):
        the Balloon Analogue Risk Task (BART). Journal of Experimental Psychology: Applied, 8(2), 75.
     """
     
+    ## Parameters applied copy-on-write (see with_params).
+    _prob_params = ('mu', 'sd')
+    
     def __init__(self, pumps=10, mu=5, sd=1):
         
-        ## Define one-step transition matrix.
+        ## Define one-step transitions.
         n = pumps
-        T = np.zeros((n+2,n+2)) * np.nan
-        T[np.arange(n),np.arange(n)+1] = 1   # Corridor transitions
-        T[:n,n] = 1                          # Safety transition
-        T[:n,n+1] = 0                        # Danger transition
-        T[[n,n+1],[n,n+1]] = 1               # Terminal states 
+        corridor = np.arange(n-1)            # Last step coincides with safety
+        S       = np.concatenate([corridor, np.arange(n), np.arange(n), [n,n+1]])
+        S_prime = np.concatenate([corridor+1, np.full(n,n), np.full(n,n+1), [n,n+1]])
 
         ## Define rewards.
-        R = np.copy(T)
-        R[np.arange(n),np.arange(n)+1] = 0   # Internal transitions
-        R[:n,n] = np.arange(n) + 1           # Safety transition
-        R[:n,n+1] = -np.arange(n)            # Danger transition
-        R[[n,n+1],[n,n+1]] = 0               # Terminal states 
-        
+        R = np.concatenate([np.zeros(n-1),            # Internal transitions
+                            np.arange(n) + 1,         # Safety transition
+                            -np.arange(n),            # Danger transition
+                            [0,0]])                   # Terminal states
+
         ## Define start/terminal states.
         start = 0
-        terminal = []
-        for s in range(T.shape[0]):
-            s_prime, = np.nonzero(~np.isnan(T[s]))
-            if np.all(s_prime == s): terminal.append(s)
+        terminal = [n,n+1]
 
         ## Initialize GraphWorld.
-        GraphWorld.__init__(self, T, R, start, terminal, epsilon=0)
+        self._initialize(n+2, S, S_prime, R, start, terminal, epsilon=0, rolled=True)
             
         ## Remove masochistic Q-values (i.e. agent cannot elect to pop balloon).
         bps = self.n_states - 1
-        sane_ix = [np.logical_or(arr[0]!=bps, arr.size==1) for arr in self.info["S'"].values]
-        self.info = self.info[sane_ix].reset_index(drop=True)
+        sane_ix = np.logical_or(self.S_prime[self.o_ptr[:-1]] != bps, np.diff(self.o_ptr) == 1)
+        self._subset(sane_ix)
             
         ## Update probability of balloon pop.
-        states = np.arange(pumps)
-        cdf = norm(mu, sd).cdf(states)
-        
-        for i, row in self.info.iterrows():
-    
-            s, s_prime = row["S"], row["S'"][0]
-            if not s_prime in self.terminal:
-                self.info.at[i,'T'] = np.array([1-cdf[s], 0, cdf[s]])
+        self._params = dict(pumps=pumps, mu=mu, sd=sd)
+        self._set_probs()
                 
+    def _set_probs(self):
+        """Set probability of balloon pop under the current parameters."""
+        mu, sd = self._params['mu'], self._params['sd']
+        self._set_pop(norm(mu, sd).cdf(np.arange(self._params['pumps'])))
+        
+    def _set_pop(self, cdf):
+        """Set probability of balloon pop (cdf: cumulative pop probability per pump)."""
+        ix, = np.where(~np.in1d(self.S_prime[self.o_ptr[:-1]], self.terminal))
+        s = self.S[ix]
+        self.probs[self.o_ptr[ix,np.newaxis] + np.arange(3)] = \
+            np.column_stack([1-cdf[s], np.zeros_like(cdf[s]), cdf[s]])
+        self._invalidate()
+        
+    @classmethod
+    def family(cls, pumps=10, mu=5, sd=1):
+        """Build environments over a grid of balloon pop distributions.
+        
+        Parameters
+        ----------
+        pumps : int
+            Maximum number of balloon pumps.
+        mu : float | array
+            Average state(s) at which balloon pops.
+        sd : float | array
+            Deviation(s) around mean.
+            
+        Returns
+        -------
+        gyms : list of BART instances
+            One environment per combination of mu and sd (mu varies slowest).
+            
+        Notes
+        -----
+        The transition structure is built once and shared across environments
+        (only the outcome probabilities differ). Pop probabilities of all 
+        environments are computed in one vectorized step.
+        """
+        
+        ## Define parameter grid.
+        mu, sd = [arr.flatten() for arr in np.meshgrid(mu, sd, indexing='ij')]
+        cdf = norm(mu[:,np.newaxis], sd[:,np.newaxis]).cdf(np.arange(pumps))
+        
+        ## Build environments.
+        base = cls(pumps, mu[0], sd[0])
+        gyms = []
+        for m, s, c in zip(mu, sd, cdf):
+            gym = base._clone()
+            gym._params.update(mu=m, sd=s)
+            gym._set_pop(c)
+            gyms.append(gym)
+            
+        return gyms
+            
     def __repr__(self):
         return '<GraphWorld | Balloon Analog Risk Task>'
\ No newline at end of file
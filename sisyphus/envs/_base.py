@@ -1,6 +1,7 @@
 import numpy as np
+from copy import copy
 from pandas import DataFrame
-from scipy.spatial.distance import cdist
+from scipy.sparse import issparse
 
 def grid_to_adj(grid, terminal=False):
     """Convert grid world to adjacency matrix.
@@ -23,38 +24,91 @@ def grid_to_adj(grid, terminal=False):
     are treated as nonviable states and excluded from further processing.        
     """
     
-    ## Identify coordinates of viable states.
-    rr = np.array(np.where(~np.isnan(grid))).T
-
-    ## Compute adjacency matrix.
-    A = (cdist(rr,rr)==1).astype(int)
+    ## Identify edges between viable states.
+    S, S_prime = grid_to_edges(grid, terminal if np.any(terminal) else None)
 
     ## Define one-step transition matrix.
-    T = np.where(A, 1, np.nan)
+    n_states = np.sum(~np.isnan(grid))
+    T = np.full((n_states, n_states), np.nan)
+    T[S, S_prime] = 1
+    
+    return T
+
+def grid_to_edges(grid, terminal=None, diagonal=False):
+    """Convert grid world to edge list.
+    
+    Parameters
+    ----------
+    grid : array, shape (i,j)
+        Grid world.
+    terminal : array
+        List of terminal states.
+    diagonal : bool
+        If True, states are connected to their 8 neighbors (including 
+        diagonals). Otherwise states are connected to their 4 neighbors.
+        
+    Returns
+    -------
+    S : array, shape (n_edges,)
+        Origin state of each edge.
+    S_prime : array, shape (n_edges,)
+        Successor state of each edge.
+        
+    Notes
+    -----
+    States are indexed in row-major order over viable (non-NaN) grid 
+    tiles, as in grid_to_adj. Terminal states have a single self-loop. 
+    Edges are sorted by origin, then successor state. Time and memory 
+    scale linearly with the number of tiles.
+    """
+    
+    ## Index viable states.
+    viable = ~np.isnan(np.asarray(grid, dtype=float))
+    index = np.full(viable.shape, -1)
+    index[viable] = np.arange(viable.sum())
+    rows, cols = np.where(viable)
+    
+    ## Define neighbor offsets (in row-major order).
+    if diagonal:
+        offsets = [(-1,-1), (-1,0), (-1,1), (0,-1), (0,1), (1,-1), (1,0), (1,1)]
+    else:
+        offsets = [(-1,0), (0,-1), (0,1), (1,0)]
     
+    ## Identify neighbors of each state.
+    S_prime = np.full((rows.size, len(offsets)), -1)
+    for k, (dr, dc) in enumerate(offsets):
+        r, c = rows + dr, cols + dc
+        ix = np.logical_and.reduce([r >= 0, r < viable.shape[0], c >= 0, c < viable.shape[1]])
+        S_prime[ix,k] = index[r[ix], c[ix]]
+        
     ## Update terminal states.
-    if np.any(terminal):
-        T[terminal] = np.nan
-        T[terminal,terminal] = 1
+    if terminal is not None:
+        S_prime[terminal] = -1
+        S_prime[terminal,0] = terminal
     
-    return T
+    ## Flatten neighbor table (already sorted by successor within states).
+    S, k = np.where(S_prime >= 0)
+    return S, S_prime[S, k]
 
 class GraphWorld(object):
     """Base graph world object.
-    
+
     Parameters
     ----------
-    T : array, shape (n_states, n_states)
-        Graph adjacency matrix.
-    R : array, shape (n_states, n_states)
+    T : array | sparse matrix, shape (n_states, n_states)
+        Graph adjacency matrix. If dense, NaNs denote absent edges. If 
+        sparse, stored entries (including explicit zeros) denote edges.
+    R : array | sparse matrix, shape (n_states, n_states)
         One-step reward function.
     start : int
         Starting state.
     terminal : int | list
         Terminal states.
-    epsilon : int
-        Randomness parameter. If zero, transitions are deterministic.
-        
+    epsilon : float
+        Randomness parameter. With probability epsilon, the intended action is
+        replaced by a uniformly random action of the same state (i.e. the agent
+        moves to a random successor). If zero, transitions are deterministic.
+
     Attributes
     ----------
     states : array, shape = (n,)
@@ -65,37 +119,341 @@ class GraphWorld(object):
         Indices of viable states.
     n_viable_states : int
         Number of viable states.
+    n_actions : int
+        Total number of Q-values (i.e. state-action pairs).
+    S : array, shape = (n_actions,)
+        State associated with each Q-value.
+    a_ptr : array, shape = (n_states + 1,)
+        State-to-action index. The Q-values of state s are stored in
+        positions a_ptr[s] to a_ptr[s+1].
+    o_ptr : array, shape = (n_actions + 1,)
+        Action-to-outcome index. The outcomes of Q-value a are stored in
+        positions o_ptr[a] to o_ptr[a+1] of the outcome buffers.
+    S_prime : array, shape = (n_outcomes,)
+        Successor state of each outcome. The first outcome of each Q-value
+        is its intended successor.
+    rewards : array, shape = (n_outcomes,)
+        One-step reward of each outcome.
+    probs : array, shape = (n_outcomes,)
+        Transition probability of each outcome (excluding epsilon noise).
+    epsilon : float
+        Randomness parameter. Noise is not stored in the outcome buffers; the
+        Q-value of action a in state s is (1 - epsilon) * Q(s,a) + epsilon * 
+        mean(Q(s,:)), where Q(s,:) are the noiseless Q-values of the state.
     info : DataFrame
         Pandas DataFrame storing the dynamics of the Markov decision process.
         Rows correspond to each viable Q-value, whereas each column contains
-        its associated information.
+        its associated information (including epsilon noise). Materialized 
+        from the outcome buffers on first access.
     """
-    
+
+    ## Constructor parameters (see with_params).
+    _params = dict()
+    _reward_params = ()
+    _prob_params = ()
+
     def __init__(self, T, R, start, terminal, epsilon=0):
-        
+
+        ## Identify edges.
+        if issparse(T):
+            T = T.tocoo()
+            S, S_prime = T.row, T.col
+        else:
+            S, S_prime = np.where(~np.isnan(T))
+
+        ## Identify rewards of edges.
+        if issparse(R):
+            R = np.asarray(R.tocsr()[S, S_prime]).ravel()
+        else:
+            R = np.asarray(R)[S, S_prime]
+
+        ## Initialize MDP.
+        self._initialize(T.shape[0], S, S_prime, R, start, terminal, epsilon)
+
+    @classmethod
+    def from_edges(cls, S, S_prime, R, start, terminal, n_states=None, epsilon=0):
+        """Initialize graph world from an edge list.
+
+        Memory scales with the number of edges, such that no n_states x 
+        n_states matrices are materialized.
+
+        Parameters
+        ----------
+        S : array, shape (n_edges,)
+            Origin state of each edge. Every state requires at least one edge 
+            (terminal states a self-loop).
+        S_prime : array, shape (n_edges,)
+            Successor state of each edge.
+        R : float | array, shape (n_edges,)
+            One-step reward of each edge.
+        start : int
+            Starting state.
+        terminal : int | list
+            Terminal states.
+        n_states : int
+            Total number of states. Defaults to the largest state index + 1.
+        epsilon : float
+            Randomness parameter. If zero, transitions are deterministic.
+
+        Returns
+        -------
+        gym : GraphWorld instance
+            Simulation environment.
+        """
+        S, S_prime = np.asarray(S, dtype=int), np.asarray(S_prime, dtype=int)
+        if n_states is None: n_states = max(S.max(), S_prime.max()) + 1
+        gym = cls.__new__(cls)
+        gym._initialize(n_states, S, S_prime, np.broadcast_to(R, S.shape), start, terminal,
+                        epsilon)
+        return gym
+
+    def _initialize(self, n_states, S, S_prime, R, start, terminal, epsilon=0, rolled=False,
+                    ordered=False):
+        """Initialize MDP from an edge list.
+
+        The Q-values of each state follow the roll order of its (sorted)
+        successors, i.e. the j-th Q-value of a state with k successors leads
+        to its (-j mod k)-th successor. If ordered, Q-values instead keep the
+        order of the edge list.
+        """
+
+        ## Error-catching.
+        if epsilon < 0 or epsilon > 1: raise ValueError('Parameter "epsilon" must be in range [0,1].')
+        self.epsilon = float(epsilon)
+
         ## Define start / terminal states.
         self.start = start
         self.terminal = terminal
-            
+
         ## Define state information.
-        self.states = np.arange(T.shape[0])
+        self.states = np.arange(n_states)
         self.n_states = self.states.size
 
         self.viable_states = self.states[~np.in1d(self.states, self.terminal)]
         self.n_viable_states = self.viable_states.size
 
-        ## Iteratively define MDP information.
-        info = []
-        for s in range(self.n_states):
-            
-            ## Observe information.
-            s_prime, = np.where(~np.isnan(T[s]))
-            r = R[s, s_prime]
-            t = np.append(1-epsilon, np.ones(r.size-1)*epsilon)
-            
-            ## Iteratively append.
-            for i in range(s_prime.size): 
-                info.append({ "S":s, "S'":np.roll(s_prime,i), "R":np.roll(r,i), "T":t })
-        
+        ## Sort edges by state, then successor (or edge order).
+        S, S_prime = np.asarray(S, dtype=int), np.asarray(S_prime, dtype=int)
+        order = np.argsort(S, kind='stable') if ordered else np.lexsort((S_prime, S))
+
+        ## Arrange Q-values of each state in roll order.
+        if not ordered:
+            k = np.bincount(S, minlength=n_states)
+            first = np.append(0, np.cumsum(k))[S[order]]
+            order = order[first + (first - np.arange(S.size)) % k[S[order]]]
+
+        ## Compile MDP information.
+        self._compile(S[order], S_prime[order], np.asarray(R, dtype=float)[order], rolled)
+
+    def _compile(self, S, S_prime, R, rolled=False):
+        """Compile edge list into compact transition buffers.
+
+        Each edge defines one Q-value, whose single outcome is its intended 
+        successor. If rolled, the outcomes of each Q-value are instead the
+        intended successors of all Q-values of its state, starting with its
+        own and followed by those of the preceding Q-values (with zero 
+        probability for the others). Subclasses use the rolled layout to 
+        assign stochastic outcomes in place.
+        """
+
+        ## Define state-to-action index.
+        k = np.bincount(S, minlength=self.n_states)
+        a_ptr = np.append(0, np.cumsum(k))
+
+        ## Define deterministic outcomes.
+        if not rolled:
+            self._set_dynamics(S, a_ptr, np.arange(S.size + 1), S_prime, 
+                               np.asarray(R, dtype=float), np.ones(S.size))
+            return
+
+        ## Define action-to-outcome index.
+        o_ptr = np.append(0, np.cumsum(k[S]))
+
+        ## Locate each outcome within its state's edges.
+        owner = np.repeat(np.arange(S.size), k[S])
+        m = np.arange(o_ptr[-1]) - o_ptr[owner]
+        j = owner - a_ptr[S[owner]]
+        edge = a_ptr[S[owner]] + (j - m) % k[S[owner]]
+
         ## Store.
-        self.info = DataFrame(info, columns=("S","S'","R","T"))
\ No newline at end of file
+        self._set_dynamics(S, a_ptr, o_ptr, S_prime[edge], np.asarray(R, dtype=float)[edge],
+                           np.where(m == 0, 1, 0).astype(float))
+
+    def _set_dynamics(self, S, a_ptr, o_ptr, S_prime, rewards, probs):
+        """Store compact transition buffers (invalidates info)."""
+
+        ## Error-catching (state values are reductions over nonempty segments).
+        empty = np.flatnonzero(np.diff(a_ptr) == 0)
+        if empty.size:
+            raise ValueError('States without outgoing edges: %s (terminal states require '
+                             'self-loops).' %', '.join(map(str, empty[:10])))
+
+        self.S = S
+        self.a_ptr = a_ptr
+        self.o_ptr = o_ptr
+        self.S_prime = S_prime
+        self.rewards = rewards
+        self.probs = probs
+        self.n_actions = S.size
+        self._invalidate()
+
+    def _invalidate(self):
+        """Clear quantities derived from the transition buffers."""
+        self._info = None
+        self._cache = dict()
+
+    def _clone(self):
+        """Shallow copy sharing index and reward buffers (probs are copied)."""
+        gym = copy(self)
+        gym._params = dict(self._params)
+        gym.probs = self.probs.copy()
+        gym._invalidate()
+        return gym
+
+    def _outcome_rewards(self):
+        """One-step reward of each outcome under the current parameters."""
+        raise NotImplementedError
+
+    def _set_probs(self):
+        """Update outcome probabilities (in place) under the current parameters."""
+        raise NotImplementedError
+
+    def with_params(self, **params):
+        """Copy of environment with new parameters.
+
+        Parameters that only affect rewards (or outcome probabilities) are
+        applied copy-on-write: the copy shares the transition structure with
+        the original environment and only replaces its reward (or probability)
+        buffer. The randomness parameter (epsilon) is not stored in the buffers
+        and is likewise applied copy-on-write. Changing any other parameter 
+        rebuilds the environment.
+
+        Parameters
+        ----------
+        params : dict
+            Constructor parameters of the environment.
+
+        Returns
+        -------
+        gym : GraphWorld instance
+            Simulation environment.
+        """
+
+        ## Error-catching.
+        unknown = set(params) - set(self._params)
+        if unknown: raise ValueError('Invalid parameter(s): %s' %', '.join(sorted(unknown)))
+
+        ## Rebuild on structural changes.
+        if set(params) - set(self._reward_params) - set(self._prob_params) - {'epsilon'}:
+            return type(self)(**{**self._params, **params})
+
+        ## Copy environment.
+        gym = copy(self)
+        gym._params = {**self._params, **params}
+        gym._info = None
+
+        ## Update buffers.
+        if 'epsilon' in params:
+            if params['epsilon'] < 0 or params['epsilon'] > 1:
+                raise ValueError('Parameter "epsilon" must be in range [0,1].')
+            gym.epsilon = float(params['epsilon'])
+            gym._invalidate()
+        if set(params) & set(self._prob_params):
+            gym.probs = self.probs.copy()
+            gym._invalidate()
+            gym._set_probs()
+        if set(params) & set(self._reward_params):
+            gym.rewards = gym._outcome_rewards()
+
+        return gym
+
+    def with_rewards(self, rewards):
+        """Copy of environment with new rewards.
+
+        The transition structure is shared with the original environment, as
+        are cached quantities that do not depend on rewards (e.g. successor 
+        features).
+
+        Parameters
+        ----------
+        rewards : array, shape (n_outcomes,) | array or sparse matrix, shape (n_states, n_states)
+            One-step reward of each outcome, or one-step reward function.
+
+        Returns
+        -------
+        gym : GraphWorld instance
+            Simulation environment.
+        """
+
+        ## Identify rewards of outcomes.
+        if issparse(rewards) or np.ndim(rewards) == 2:
+            owner = np.repeat(self.S, np.diff(self.o_ptr))
+            if issparse(rewards): rewards = np.asarray(rewards.tocsr()[owner, self.S_prime]).ravel()
+            else: rewards = np.asarray(rewards)[owner, self.S_prime]
+        rewards = np.array(rewards, dtype=float)
+        if rewards.shape != self.rewards.shape:
+            raise ValueError('Rewards must have shape (n_outcomes,) or (n_states, n_states).')
+
+        ## Copy environment.
+        gym = copy(self)
+        gym.rewards = rewards
+        gym._info = None
+        return gym
+
+    def _subset(self, ix):
+        """Restrict MDP to a subset of Q-values."""
+
+        ## Identify retained actions / outcomes.
+        ix = np.flatnonzero(ix) if np.asarray(ix).dtype == bool else np.asarray(ix)
+        n = np.diff(self.o_ptr)[ix]
+        o_ix = np.repeat(self.o_ptr[ix] - np.append(0, np.cumsum(n)[:-1]), n) + np.arange(n.sum())
+
+        ## Rebuild indices.
+        S = self.S[ix]
+        a_ptr = np.append(0, np.cumsum(np.bincount(S, minlength=self.n_states)))
+        o_ptr = np.append(0, np.cumsum(n))
+
+        self._set_dynamics(S, a_ptr, o_ptr, self.S_prime[o_ix], self.rewards[o_ix],
+                           self.probs[o_ix])
+
+    @property
+    def info(self):
+        """Pandas DataFrame view of the MDP dynamics."""
+        if self._info is None:
+            if self.epsilon:
+                S_prime, rewards, probs, o_ptr = self._noisy_outcomes()
+            else:
+                S_prime, rewards, probs, o_ptr = self.S_prime, self.rewards, self.probs, self.o_ptr
+            split = o_ptr[1:-1]
+            self._info = DataFrame({"S": self.S,
+                                    "S'": np.split(S_prime, split),
+                                    "R": np.split(rewards, split),
+                                    "T": np.split(probs, split)},
+                                   columns=("S","S'","R","T"))
+        return self._info
+
+    def _noisy_outcomes(self):
+        """Materialize outcome buffers including epsilon noise.
+
+        The outcomes of each Q-value are the outcomes of all Q-values of its
+        state, starting with its own and followed by those of the preceding 
+        Q-values (as in the rolled layout). Storage scales quadratically with
+        the number of actions per state (for display only).
+        """
+
+        ## Pair each Q-value with the Q-values of its state (own Q-value first).
+        k = np.diff(self.a_ptr)[self.S]
+        owner = np.repeat(np.arange(self.n_actions), k)
+        m = np.arange(owner.size) - np.repeat(np.cumsum(k) - k, k)
+        first = self.a_ptr[self.S[owner]]
+        other = first + (owner - first - m) % k[owner]
+
+        ## Identify outcomes of paired Q-values.
+        n = np.diff(self.o_ptr)[other]
+        o = np.repeat(self.o_ptr[other] - np.append(0, np.cumsum(n)[:-1]), n) + np.arange(n.sum())
+
+        ## Mix outcome probabilities.
+        weight = np.where(m == 0, 1 - self.epsilon, 0) + self.epsilon / k[owner]
+        o_ptr = np.append(0, np.cumsum(np.bincount(owner, weights=n, minlength=self.n_actions)))
+        return self.S_prime[o], self.rewards[o], np.repeat(weight, n) * self.probs[o], \
+               o_ptr.astype(int)
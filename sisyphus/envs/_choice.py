@@ -35,37 +35,62 @@ class FreeChoice(GraphWorld):
        over monetary gains and losses. Psychological science, 25(2), 596-604.
     """
     
+    ## Parameters applied copy-on-write (see with_params).
+    _reward_params = ('rewards',)
+    _prob_params = ('probs',)
+    
     def __init__(self, rewards=[-1,1], probs=None):
     
         ## Error-catching.
         if probs is None: probs = np.ones_like(rewards) / len(rewards)
         assert len(rewards) == len(probs)
         
-        ## Define one-step transition matrix.
+        ## Define one-step transitions.
         n = len(rewards)
-        T = np.zeros((n+5,n+5)) * np.nan
-        T[0,[1,2]] = 1                            # First choice
-        T[1,[3,4]] = 1                            # Second choice
-        T[2:5,-n:] = 1                            # Reward transitions
-        T[np.arange(5,n+5),np.arange(5,n+5)] = 1  # Terminal states
+        terminal = np.arange(5,n+5)
+        S       = np.concatenate([[0,0,1,1], np.repeat([2,3,4],n), terminal])
+        S_prime = np.concatenate([[1,2,3,4], np.tile(terminal,3), terminal])
 
-        ## Define rewards.
-        R = np.copy(T)
-        R[np.where(~np.isnan(R))] = 0
-        R[2:5,-n:] = rewards                      # Reward transitions
-        
         ## Define start/terminal states.
         start = 0
-        terminal = np.arange(5,n+5)
 
         ## Initialize GraphWorld.
-        GraphWorld.__init__(self, T, R, start, terminal, epsilon=0)
+        self._params = dict(rewards=rewards, probs=probs)
+        self._initialize(n+5, S, S_prime, np.zeros(S.size), start, terminal, epsilon=0, 
+                         rolled=True)
         
-        ## Update info.
+        ## Collapse reward transitions into single (probabilistic) Q-values.
+        first = np.in1d(np.arange(self.n_actions), self.a_ptr[[2,3,4]])
+        self._subset(np.logical_or(~np.in1d(self.S, [2,3,4]), first))
+        self._set_probs()
+        
+        ## Define rewards.
+        self.rewards = self._outcome_rewards()
+        
+    def _outcome_rewards(self):
+        """One-step reward of each outcome."""
+        S = np.repeat(self.S, np.diff(self.o_ptr))
+        R = np.zeros(S.size)                                       # Choice / terminal transitions
+        ix = np.in1d(S, [2,3,4])
+        R[ix] = np.asarray(self._params['rewards'])[self.S_prime[ix] - 5]   # Reward transitions
+        return R
+        
+    def _set_probs(self):
+        """Set outcome probabilities of reward transitions."""
         for s in [2,3,4]:
-            ix, = np.where(self.info.S == s)
-            self.info = self.info.drop(ix[1:]).reset_index(drop=True)
-            self.info.at[ix[0],'T'] = probs
+            a = self.a_ptr[s]
+            self.probs[self.o_ptr[a]:self.o_ptr[a+1]] = self._params['probs']
+            
+    def with_params(self, **params):
+        """Copy of environment with new parameters (see GraphWorld.with_params).
+        
+        Changing the number of outcomes rebuilds the environment."""
+        n = len(params.get('rewards', self._params['rewards']))
+        if n != len(self._params['rewards']):
+            return FreeChoice(**{**self._params, 'probs': None, **params})
+        if 'probs' in params and params['probs'] is None: 
+            params['probs'] = np.ones(n) / n
+        return GraphWorld.with_params(self, **params)
         
     def __repr__(self):
         return '<GraphWorld | Instrumental Free Choice>'
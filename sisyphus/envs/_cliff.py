@@ -1,5 +1,5 @@
 import numpy as np
-from ._base import GraphWorld, grid_to_adj
+from ._base import GraphWorld, grid_to_edges
 
 class CliffWalking(GraphWorld):
     """Cliff-walking task environment.
@@ -8,6 +8,12 @@ class CliffWalking(GraphWorld):
     ----------
     cliff : float
         Value of falling off cliff.
+    shape : tuple
+        Number of rows and columns of the grid. The cliff spans the bottom 
+        row between the start (bottom-left) and goal (bottom-right) tiles.
+    epsilon : float
+        Probability that the agent moves to a random neighboring tile
+        instead of the intended one.
     
     Attributes
     ----------
@@ -30,28 +36,38 @@ class CliffWalking(GraphWorld):
     2. Gaskett, C. (2003). Reinforcement learning under circumstances beyond its control.
     """
     
-    def __init__(self, cliff=-100):
+    ## Parameters applied copy-on-write (see with_params).
+    _reward_params = ('cliff',)
+    
+    def __init__(self, cliff=-100, shape=(11,12), epsilon=0):
     
         ## Define gridworld.
-        self.grid = np.arange(11 * 12, dtype=int).reshape(11,12)
+        self.grid = np.arange(np.prod(shape), dtype=int).reshape(shape)
         self.shape = self.grid.shape
 
         ## Define start/terminal states.
-        start = 120
-        terminal = np.array([121, 122, 123, 124, 125, 126, 127, 128, 129, 130, 131])
+        start = int(self.grid[-1,0])
+        terminal = self.grid[-1,1:]
 
-        ## Define one-step transition matrix.
-        T = grid_to_adj(self.grid, terminal)
+        ## Define one-step transitions.
+        S, S_prime = grid_to_edges(self.grid, terminal)
         
-        ## Define rewards.
-        R = -1 * np.ones_like(T)              # Majority transitions
-        R[:,terminal[:-1]] = cliff            # Cliff transitions
-        R[:,terminal[-1]] = 0                 # Safety transitions
-        R[terminal,terminal] = 0              # Terminal transitions
-        R *= T
-            
         ## Initialize GraphWorld.
-        GraphWorld.__init__(self, T, R, start, terminal, epsilon=0)
+        self._params = dict(cliff=cliff, shape=shape, epsilon=epsilon)
+        self._initialize(self.grid.size, S, S_prime, np.zeros(S.size), start, terminal, 
+                         epsilon=epsilon)
+
+        ## Define rewards.
+        self.rewards = self._outcome_rewards()
+        
+    def _outcome_rewards(self):
+        """One-step reward of each outcome."""
+        S = np.repeat(self.S, np.diff(self.o_ptr))
+        R = -1 * np.ones(S.size)                                               # Majority transitions
+        R[np.in1d(self.S_prime, self.terminal[:-1])] = self._params['cliff']   # Cliff transitions
+        R[self.S_prime == self.terminal[-1]] = 0                               # Safety transitions
+        R[np.in1d(S, self.terminal)] = 0                                       # Terminal transitions
+        return R
         
     def __repr__(self):
         return '<GraphWorld | Cliff-Walking Task>'
@@ -93,7 +109,7 @@ class CliffWalking(GraphWorld):
         if ax is None: fig, ax = plt.subplots(1,1,figsize=(5,5))
         
         ## Define grid.
-        grid = np.zeros((11, 12))    # Grid titles
+        grid = np.zeros(self.shape)  # Grid titles
         grid[-1, 1:-1] = 1           # Cliff edge
         grid[-1,0] = 2               # Start tile
         grid[-1,-1] = 3              # Goal tile
@@ -106,14 +122,15 @@ class CliffWalking(GraphWorld):
         ax.set(xticklabels=[], yticklabels=[])  
 
         ## Add outline.
-        ax.vlines(np.arange(1,12),0,10,lw=0.1)
-        ax.hlines(np.arange(1,11),0,12,lw=0.1)
+        x,y = self.shape
+        ax.vlines(np.arange(1,y),0,x-1,lw=0.1)
+        ax.hlines(np.arange(1,x),0,y,lw=0.1)
 
         ## Annotate.
         if annot:
             if annot_kws is None: annot_kws = dict()
-            ax.text(0.5,10.5,'S',ha='center',va='center',**annot_kws)
-            ax.text(11.5,10.5,'G',ha='center',va='center',**annot_kws)
+            ax.text(0.5,x-0.5,'S',ha='center',va='center',**annot_kws)
+            ax.text(y-0.5,x-0.5,'G',ha='center',va='center',**annot_kws)
 
         return ax
     
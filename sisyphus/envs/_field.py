@@ -1,5 +1,5 @@
 import numpy as np
-from ._base import GraphWorld, grid_to_adj
+from ._base import GraphWorld, grid_to_edges
 
 class OpenField(GraphWorld):
     """Open field task environment.
@@ -10,6 +10,13 @@ class OpenField(GraphWorld):
         Value of reward.
     punishment : float
         Value of punishment.
+    shape : tuple
+        Number of rows and columns of the grid. The agent starts in the 
+        middle of the bottom row; the reward and punishment are located in 
+        the second row, two tiles from the left and right walls.
+    epsilon : float
+        Probability that the agent moves to a random neighboring tile
+        instead of the intended one.
     
     Attributes
     ----------
@@ -28,28 +35,38 @@ class OpenField(GraphWorld):
     
     """
     
-    def __init__(self, reward=10, punishment=-10):
+    ## Parameters applied copy-on-write (see with_params).
+    _reward_params = ('reward', 'punishment')
+    
+    def __init__(self, reward=10, punishment=-10, shape=(11,11), epsilon=0):
     
         ## Define gridworld.
-        self.grid = np.arange(11 * 11, dtype=int).reshape(11,11)
+        self.grid = np.arange(np.prod(shape), dtype=int).reshape(shape)
         self.shape = self.grid.shape
 
         ## Define start/terminal states.
-        start = 115
-        terminal = np.array([13,19])
-
-        ## Define one-step transition matrix.
-        T = grid_to_adj(self.grid, terminal)
+        start = int(self.grid[-1, shape[1] // 2])
+        terminal = np.array([self.grid[1,2], self.grid[1,-3]])
 
-        ## Define rewards.
-        R = 0 * np.ones_like(T)               # Majority transitions
-        R[:,13] = reward                      # Reward transition
-        R[:,19] = punishment                  # Punishment transition
-        R[terminal,terminal] = 0              # Terminal transitions
-        R *= T
+        ## Define one-step transitions.
+        S, S_prime = grid_to_edges(self.grid, terminal)
 
         ## Initialize GridWorld.
-        GraphWorld.__init__(self, T, R, start, terminal, epsilon=0)
+        self._params = dict(reward=reward, punishment=punishment, shape=shape, epsilon=epsilon)
+        self._initialize(self.grid.size, S, S_prime, np.zeros(S.size), start, terminal, 
+                         epsilon=epsilon)
+
+        ## Define rewards.
+        self.rewards = self._outcome_rewards()
+        
+    def _outcome_rewards(self):
+        """One-step reward of each outcome."""
+        S = np.repeat(self.S, np.diff(self.o_ptr))
+        R = np.zeros(S.size)                                               # Majority transitions
+        R[self.S_prime == self.terminal[0]] = self._params['reward']       # Reward transition
+        R[self.S_prime == self.terminal[1]] = self._params['punishment']   # Punishment transition
+        R[np.in1d(S, self.terminal)] = 0                                   # Terminal transitions
+        return R
         
     def __repr__(self):
         return '<GraphWorld | Open Field Task>'
@@ -94,7 +111,7 @@ class OpenField(GraphWorld):
         if ax is None: fig, ax = plt.subplots(1,1,figsize=(5,5))
 
         ## Define grid.
-        grid = np.zeros((11, 11))    # Viable states
+        grid = np.zeros(self.shape)  # Viable states
         grid[1,[2,-3]] = [1, 2]      # Reward/punishment states
 
         ## Define colormap.
@@ -105,14 +122,15 @@ class OpenField(GraphWorld):
         ax.set(xticklabels=[], yticklabels=[])  
 
         ## Add outline.
-        ax.vlines(np.arange(1,11),0,11,lw=0.1)
-        ax.hlines(np.arange(1,11),0,11,lw=0.1)
+        x,y = self.shape
+        ax.vlines(np.arange(1,y),0,x,lw=0.1)
+        ax.hlines(np.arange(1,x),0,y,lw=0.1)
 
         ## Annotate.
         if annot:
             if annot_kws is None: annot_kws = dict()
             ax.text(2.5,1.5,reward,ha='center',va='center',**annot_kws)
-            ax.text(8.45,1.5,punishment,ha='center',va='center',**annot_kws)
+            ax.text(self.shape[1]-2.55,1.5,punishment,ha='center',va='center',**annot_kws)
         
         return ax
     
@@ -1,5 +1,5 @@
 import numpy as np
-from ._base import GraphWorld, grid_to_adj
+from ._base import GraphWorld, grid_to_edges
 
 class Helplessness(GraphWorld):
     """Learned helplessness environment.
@@ -10,6 +10,10 @@ class Helplessness(GraphWorld):
         Value of reward.
     punishment : float
         Value of punishment.
+    shape : tuple
+        Number of rows and columns of the grid (including the exit column).
+        The reward, punishment and exit are located in the middle row, at 
+        the left wall, center and right end of the grid, respectively.
     
     Attributes
     ----------
@@ -27,33 +31,42 @@ class Helplessness(GraphWorld):
         its associated information.
     """
     
-    def __init__(self, reward=10, punishment=-10):
+    ## Parameters applied copy-on-write (see with_params).
+    _reward_params = ('reward', 'punishment')
+    
+    def __init__(self, reward=10, punishment=-10, shape=(5,16)):
         
         ## Define gridworld.
-        grid = np.zeros((5,16),dtype=float)
-        grid[[0, 1, 3, 4], [-1, -1, -1, -1]] = np.nan
+        grid = np.zeros(shape,dtype=float)
+        grid[np.arange(shape[0]) != shape[0] // 2, -1] = np.nan
         grid[np.where(~np.isnan(grid))] = np.arange(np.invert(np.isnan(grid)).sum())
         self.grid = grid
         self.shape = self.grid.shape
         
         ## Define start/terminal states.
-        start = 44
-        terminal = np.array([30, 37, 45])
+        row = grid[shape[0] // 2].astype(int)
+        start = int(row[-2])
+        terminal = row[[0, (shape[1] - 1) // 2, -1]]
 
-        ## Define one-step transition matrix.
-        T = grid_to_adj(self.grid, terminal)
-        self.T = T
+        ## Define one-step transitions.
+        S, S_prime = grid_to_edges(self.grid, terminal)
+        
+        ## Initialize GraphWorld.
+        self._params = dict(reward=reward, punishment=punishment, shape=shape)
+        self._initialize(int(np.nanmax(grid)) + 1, S, S_prime, np.zeros(S.size), start, terminal, 
+                         epsilon=0)
         
         ## Define rewards.
-        outcomes = [reward, punishment, 0]
-        R = np.zeros_like(T) 
-        for s, r in zip(terminal, outcomes): R[:,s] = r
-        R[terminal,terminal] = 0
-        R *= T
+        self.rewards = self._outcome_rewards()
         
-        ## Initialize GraphWorld.
-        GraphWorld.__init__(self, T, R, start, terminal, epsilon=0)
-        self.R = R
+    def _outcome_rewards(self):
+        """One-step reward of each outcome."""
+        S = np.repeat(self.S, np.diff(self.o_ptr))
+        outcomes = [self._params['reward'], self._params['punishment'], 0]
+        R = np.zeros(S.size)
+        for s, r in zip(self.terminal, outcomes): R[self.S_prime == s] = r
+        R[np.in1d(S, self.terminal)] = 0
+        return R
         
     def __repr__(self):
         return '<GraphWorld | Learned Helplessness>'
@@ -98,8 +111,9 @@ class Helplessness(GraphWorld):
         if ax is None: fig, ax = plt.subplots(1,1,figsize=(5,5))
 
         ## Define grid.
-        grid = np.zeros((5, 15))      # Viable states
-        grid[[2,2],[0,7]] = [1, 2]    # Reward/punishment states
+        x,y = self.shape
+        grid = np.zeros((x, y-1))                 # Viable states
+        grid[x//2,[0,(y-1)//2]] = [1, 2]          # Reward/punishment states
 
         ## Define colormap.
         cmap = ListedColormap([grid_color, reward_color, punishment_color])
@@ -109,17 +123,16 @@ class Helplessness(GraphWorld):
         ax.set(xticklabels=[], yticklabels=[])  
 
         ## Add outline.
-        x,y = self.shape
         ax.vlines(np.arange(1,y),0,x,lw=0.1)
         ax.hlines(np.arange(1,x),0,y,lw=0.1)
 
         ## Annotate.
         if annot:
             if annot_kws is None: annot_kws = dict()
-            ax.text(0.5,2.5,reward,ha='center',va='center',**annot_kws)
-            ax.text(7.45,2.5,punishment,ha='center',va='center',**annot_kws)
+            ax.text(0.5,x//2+0.5,reward,ha='center',va='center',**annot_kws)
+            ax.text((y-1)//2+0.45,x//2+0.5,punishment,ha='center',va='center',**annot_kws)
             annot_kws['color'] = 'k'
-            ax.text(14.5,2.5,'S',ha='center',va='center',**annot_kws)
+            ax.text(y-1.5,x//2+0.5,'S',ha='center',va='center',**annot_kws)
         
         return ax
     
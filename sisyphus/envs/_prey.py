@@ -32,43 +32,68 @@ class SleepingPredator(GraphWorld):
        J Exp Psychol Hum Percept Perform 43:18–29.
     """
     
+    ## Parameters applied copy-on-write (see with_params).
+    _prob_params = ('p',)
+    
     def __init__(self, p=0.1):
         
-        ## Define one-step transition matrix.
+        ## Define one-step transitions.
         n = 7
-        T = np.zeros((n+2,n+2)) * np.nan
-        T[np.arange(n),np.arange(n)+1] = 1   # Corridor transitions
-        T[:n,n] = 1                          # Safety transition
-        T[:n,n+1] = 0                        # Danger transition
-        T[[n,n+1],[n,n+1]] = 1               # Terminal states 
+        corridor = np.arange(n-1)            # Last step coincides with safety
+        S       = np.concatenate([corridor, np.arange(n), np.arange(n), [n,n+1]])
+        S_prime = np.concatenate([corridor+1, np.full(n,n), np.full(n,n+1), [n,n+1]])
 
         ## Define rewards.
-        R = np.copy(T)
-        R[np.arange(n),np.arange(n)+1] = 0   # Corridor transitions
-        R[:n,n] = np.arange(n)               # Safety transition
-        R[:n,n+1] = -np.arange(n)            # Danger transition
-        R[[n,n+1],[n,n+1]] = 0               # Terminal states 
-        
+        R = np.concatenate([np.zeros(n-1),            # Corridor transitions
+                            np.arange(n),             # Safety transition
+                            -np.arange(n),            # Danger transition
+                            [0,0]])                   # Terminal states
+
         ## Define start/terminal states.
         start = 0
-        terminal = []
-        for s in range(T.shape[0]):
-            s_prime, = np.nonzero(~np.isnan(T[s]))
-            if np.all(s_prime == s): terminal.append(s)
+        terminal = [n,n+1]
 
         ## Initialize GraphWorld.
-        GraphWorld.__init__(self, T, R, start, terminal, epsilon=0)
+        self._initialize(n+2, S, S_prime, R, start, terminal, epsilon=0, rolled=True)
             
         ## Remove masochistic Q-values (i.e. agent cannot elect to be eaten).
         bps = self.n_states - 1
-        sane_ix = [np.logical_or(arr[0]!=bps, arr.size==1) for arr in self.info["S'"].values]
-        self.info = self.info[sane_ix].reset_index(drop=True)
+        sane_ix = np.logical_or(self.S_prime[self.o_ptr[:-1]] != bps, np.diff(self.o_ptr) == 1)
+        self._subset(sane_ix)
             
         ## Update probability of being eaten.  
-        for i, row in self.info.iterrows():
-            s, s_prime = row["S"], row["S'"][0]
-            if not s_prime in self.terminal:
-                self.info.at[i,'T'] = np.array([1-p, 0, p])
+        self._params = dict(p=p)
+        self._set_probs()
                 
+    def _set_probs(self):
+        """Set probability of predation under the current parameters."""
+        p = self._params['p']
+        ix, = np.where(~np.in1d(self.S_prime[self.o_ptr[:-1]], self.terminal))
+        self.probs[self.o_ptr[ix,np.newaxis] + np.arange(3)] = [1-p, 0, p]
+        self._invalidate()
+        
+    @classmethod
+    def family(cls, p=0.1):
+        """Build environments over a set of predation probabilities.
+        
+        Parameters
+        ----------
+        p : float | array
+            Probability (or probabilities) of predation.
+            
+        Returns
+        -------
+        gyms : list of SleepingPredator instances
+            One environment per probability.
+            
+        Notes
+        -----
+        The transition structure is built once and shared across environments
+        (only the outcome probabilities differ).
+        """
+        p = np.atleast_1d(p)
+        base = cls(p[0])
+        return [base.with_params(p=x) for x in p]
+            
     def __repr__(self):
         return '<GraphWorld | Sleeping Predator Task>'
\ No newline at end of file
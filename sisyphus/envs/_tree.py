@@ -2,9 +2,25 @@ import numpy as np
 from scipy.stats import norm
 from ._base import GraphWorld
 
+## Rewards of the decision tree of Huys et al. (2012), in heap order.
+HUYS_REWARDS = np.array([-70,-20,-20,-70,-20,-70,-20,20,20,140,-20,20,-20,20], dtype=float)
+
 class DecisionTree(GraphWorld):
     """Decision tree from aversive pruning experiments.
     
+    Parameters
+    ----------
+    depth : int
+        Number of sequential choices.
+    branching : int
+        Number of choices available at each internal node.
+    rewards : array | distribution
+        One-step reward of entering each non-root node (in heap order), or a
+        distribution from which rewards are drawn (a frozen scipy.stats 
+        distribution, or a callable taking the number of rewards). Defaults to 
+        the rewards of Huys et al. (2012), which require depth = 3 and
+        branching = 2.
+    
     Attributes
     ----------
     states : array, shape = (n,)
@@ -19,6 +35,16 @@ class DecisionTree(GraphWorld):
         Pandas DataFrame  storing the dynamics of the Markov decision process.
         Rows correspond to each viable Q-value, whereas each column contains
         its associated information.
+    node_rewards : array, shape = (n_states,)
+        One-step reward of entering each node (zero for the root).
+        
+    Notes
+    -----
+    Nodes are stored in heap order: the children of node i are nodes 
+    branching * i + 1, ..., branching * i + branching, and the nodes of level
+    d are nodes (branching^d - 1) / (branching - 1) onwards. The Q-value of 
+    entering node c from its parent is therefore Q-value c - 1, and leaves 
+    (terminal states) follow with a single self-loop each.
                 
     References
     ----------
@@ -30,40 +56,85 @@ class DecisionTree(GraphWorld):
        Journal of Neuroscience, 0085-17.
     """
     
-    def __init__(self):
-        
-        ## Define one-step transition matrix.
-        T = np.ones((15,15)) * np.nan
-        T[0,[ 1, 2]] = 1
-        T[1,[ 3, 4]] = 1
-        T[2,[ 5, 6]] = 1
-        T[3,[ 7, 8]] = 1
-        T[4,[ 9,10]] = 1
-        T[5,[11,12]] = 1
-        T[6,[13,14]] = 1
-        T[np.arange(7,15),np.arange(7,15)] = 1
-
-        ## Define rewards.
-        R = np.copy(T)
-        R[np.where(~np.isnan(R))] = 0
-        R[0,[ 1, 2]] = [-70,-20]
-        R[1,[ 3, 4]] = [-20,-70]
-        R[2,[ 5, 6]] = [-20,-70]
-        R[3,[ 7, 8]] = [-20, 20]
-        R[4,[ 9,10]] = [ 20,140]
-        R[5,[11,12]] = [-20, 20]
-        R[6,[13,14]] = [-20, 20]
+    ## Parameters applied copy-on-write (see with_params).
+    _reward_params = ('rewards',)
+    
+    def __init__(self, depth=3, branching=2, rewards=None):
+        
+        ## Error-catching.
+        if depth < 1 or branching < 2: 
+            raise ValueError('DecisionTree requires depth >= 1 and branching >= 2.')
+        
+        ## Define heap layout.
+        self.depth = depth
+        self.branching = branching
+        n = (branching ** (depth + 1) - 1) // (branching - 1)
+        n_internal = (branching ** depth - 1) // (branching - 1)
         
+        ## Define one-step transitions.
+        leaves = np.arange(n_internal, n)
+        S       = np.concatenate([np.repeat(np.arange(n_internal), branching), leaves])
+        S_prime = np.concatenate([np.arange(1, n), leaves])
+
         ## Define start/terminal states.
         start = 0
-        terminal = np.arange(7,15)
+        terminal = leaves
 
         ## Initialize GraphWorld.
-        GraphWorld.__init__(self, T, R, start, terminal, epsilon=0)
+        self._params = dict(depth=depth, branching=branching, rewards=rewards)
+        self._initialize(n, S, S_prime, np.zeros(S.size), start, terminal, epsilon=0, 
+                         ordered=True)
+        
+        ## Define rewards.
+        self.rewards = self._outcome_rewards()
+        
+    def _outcome_rewards(self):
+        """One-step reward of each outcome (drawing rewards if necessary)."""
+        rewards, size = self._params['rewards'], self.n_states - 1
+        
+        ## Define rewards of entering each node.
+        if rewards is None:
+            if self.depth != 3 or self.branching != 2: 
+                raise ValueError('Default rewards require depth = 3 and branching = 2.')
+            rewards = HUYS_REWARDS
+        elif hasattr(rewards, 'rvs'): 
+            rewards = rewards.rvs(size)
+        elif callable(rewards): 
+            rewards = rewards(size)
+        rewards = np.asarray(rewards, dtype=float)
+        if rewards.shape != (size,): 
+            raise ValueError('Rewards must have shape (n_states - 1,).')
+        self.node_rewards = np.append(0, rewards)
+        
+        ## Assign rewards to outcomes (terminal self-loops are unrewarded).
+        return np.append(rewards, np.zeros(self.terminal.size))
+    
+    def level(self, d):
+        """Indices of the nodes at depth d (the root has depth 0)."""
+        b = self.branching
+        return np.arange((b ** d - 1) // (b - 1), (b ** (d + 1) - 1) // (b - 1))
         
     def __repr__(self):
         return '<GraphWorld | Decision Tree>'
     
+    def _node_positions(self):
+        """Plotting coordinates of nodes (leaves evenly spaced, parents centered)."""
+        b = self.branching
+        
+        ## Define leaf positions.
+        leaves = self.level(self.depth)
+        xpos = np.zeros(self.n_states)
+        xpos[leaves] = -2 + 4 * (np.arange(leaves.size) + 0.5) / leaves.size
+        
+        ## Center parents over children.
+        for d in range(self.depth - 1, -1, -1):
+            nodes = self.level(d)
+            xpos[nodes] = xpos[b * nodes[0] + 1 : b * nodes[-1] + b + 1].reshape(-1, b).mean(axis=1)
+            
+        ## Define vertical positions.
+        ypos = np.concatenate([np.full(b ** d, self.depth - d) for d in range(self.depth + 1)])
+        return xpos, ypos
+    
     def _draw_nodes(self, ax, xpos, ypos, s=1000, color=None, cmap=None, vmin=None, vmax=None, 
                 alpha=1.0, linewidth=1.0):
         """Draw decision tree nodes. See plot_decision tree for details."""
@@ -102,12 +173,12 @@ class DecisionTree(GraphWorld):
     def _draw_node_labels(self, ax, fontsize=14, color='w'):
         """Draws one-step reward values as node labels."""
 
-        ## Define node positions.
-        xpos = [-1,1,-1.5,-0.5,0.5,1.5,-1.75,-1.25,-0.75,-0.25,0.25,0.765,1.25,1.77]
-        ypos = [1.98, 1.98, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0]
+        ## Define node positions (excluding root).
+        xpos, ypos = self._node_positions()
+        xpos, ypos = xpos[1:], ypos[1:] - 0.02
         
         ## Define node values.
-        labels = [-70, -20, -20, -70, -20,-70, -20, 20, 20, 140, -20, 20, -20, 20]
+        labels = self.node_rewards[1:]
         
         for x, y, label in zip(xpos, ypos, labels):
             ax.text(x, y, '%0.0f' %label, ha='center', va='center', fontsize=fontsize, 
@@ -131,10 +202,13 @@ class DecisionTree(GraphWorld):
 
     def _draw_edge_labels(self, ax, labels, fontsize=14, alpha=1):
 
-        ## Define label positions.
-        xpos = [-0.6,0.6,-1.3,-0.7,0.7,1.3,-1.67,-1.33,-0.67,-0.33,0.33,0.67,1.33,1.67]
-        ypos = [2.5] * 2 + [1.5] * 4 + [0.5] * 8
-        halign = ['right','left'] * 7
+        ## Define label positions (edge midpoints, offset away from siblings).
+        xpos, ypos = self._node_positions()
+        side = np.sign(np.arange(self.n_states - 1) % self.branching - (self.branching - 1) / 2)
+        parents = (np.arange(1, self.n_states) - 1) // self.branching
+        xpos = (xpos[1:] + xpos[parents]) / 2 + 0.05 * side
+        ypos = ypos[1:] + 0.5
+        halign = np.array(['right','center','left'])[side.astype(int) + 1]
 
         ## Define label transparency.
         if isinstance(alpha, (int, float)): alpha = np.repeat(alpha, len(xpos))
@@ -147,12 +221,16 @@ class DecisionTree(GraphWorld):
 
     def _draw_path_sums(self, ax, xpos, linewidth=5, fontsize=14, alpha=1.0):
 
-        ## Define path sums.
-        sums = [-110, -70, -120, 0, -60, -20, -110, -70]
+        ## Define path sums (cumulative reward from root to each leaf).
+        sums = self.node_rewards.copy()
+        for d in range(1, self.depth + 1):
+            nodes = self.level(d)
+            sums[nodes] += sums[(nodes - 1) // self.branching]
+        sums = sums[self.terminal]
 
         ## Define transparency.
         if isinstance(alpha, (int, float)): alpha = np.repeat(alpha, len(sums))
-        alpha = alpha[-8:]
+        alpha = alpha[-len(sums):]
 
         ## Draw line.
         ax.hlines(-0.40, -2, 2, lw=linewidth, color='k')
@@ -208,22 +286,12 @@ class DecisionTree(GraphWorld):
         ## Initialize canvas.
         if ax is None: fig, ax = plt.subplots(1,1,figsize=(5,5))
         
-        ## Define decision tree.
-        T = np.zeros((15,15))
-        T[0,[ 1, 2]] = [-70,-20]
-        T[1,[ 3, 4]] = [-20,-70]
-        T[2,[ 5, 6]] = [-20,-70]
-        T[3,[ 7, 8]] = [-20, 20]
-        T[4,[ 9,10]] = [ 20,140]
-        T[5,[11,12]] = [-20, 20]
-        T[6,[13,14]] = [-20, 20]
-
-        ## Define decision tree edges.
-        edges = [arr.squeeze() for arr in np.array([np.where(T)]).T]
+        ## Define decision tree edges (parent, child).
+        children = np.arange(1, self.n_states)
+        edges = np.column_stack([(children - 1) // self.branching, children])
 
         ## Define node positions.
-        xpos = [0,-1,1,-1.5,-0.5,0.5,1.5,-1.75,-1.25,-0.75,-0.25,0.25,0.75,1.25,1.75]
-        ypos = [3, 2, 2, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0]
+        xpos, ypos = self._node_positions()
 
         ## Draw DAG.
         ax = self._draw_edges(ax, xpos, ypos, edges=edges, linewidth=edge_width)
@@ -231,12 +299,12 @@ class DecisionTree(GraphWorld):
                             alpha=alpha, linewidth=node_width)
 
         ## Optional details.
-        if path_sums: ax = self._draw_path_sums(ax, xpos[-8:], alpha=alpha)
+        if path_sums: ax = self._draw_path_sums(ax, xpos[self.terminal], alpha=alpha)
         if node_labels: ax = self._draw_node_labels(ax)
         if isinstance(edge_labels, (list, tuple, np.ndarray)): 
             ax = self._draw_edge_labels(ax, edge_labels, alpha=edge_label_alpha)
         elif np.equal(edge_labels, True):
-            ax = self._draw_edge_labels(ax, T[T.nonzero()], alpha=edge_label_alpha)
+            ax = self._draw_edge_labels(ax, self.node_rewards[1:], alpha=edge_label_alpha)
 
         ## Clean up.
         ax.set(xlim=(-2,2), xticks=[], yticks=[])
@@ -1,4 +1,12 @@
 """Markov decision process algorithms"""
 
 from ._dp import ValueIteration
-from ._td import ModelFree
\ No newline at end of file
+from ._td import ModelFree
+from ._policy import greedy_policy, greedy_paths, choice_probs
+from ._rollout import rollout
+from ._sr import policy_matrix, successor_representation, occupancy
+from ._sr import reward_features, successor_features, SuccessorFeatures
+from ._sweep import run_sweep
+from ._switch import switch_points
+from ._grad import sensitivities
+from ._tree import TreeSearch
\ No newline at end of file
@@ -0,0 +1,434 @@
+"""Vectorized Bellman backup module"""
+
+import numpy as np
+from heapq import heappush, heappop
+from numba import njit, prange
+
+## Integer codes of learning rules (compiled kernels).
+POLICIES = dict(max=0, min=1, softmax=2, pessimism=3)
+
+def segment_max(arr, ptr):
+    """Maximum of each segment arr[..., ptr[i]:ptr[i+1]]."""
+    return np.maximum.reduceat(arr, ptr[:-1], axis=-1)
+
+def segment_min(arr, ptr):
+    """Minimum of each segment arr[..., ptr[i]:ptr[i+1]]."""
+    return np.minimum.reduceat(arr, ptr[:-1], axis=-1)
+
+def segment_sum(arr, ptr):
+    """Sum of each segment arr[..., ptr[i]:ptr[i+1]]."""
+    return np.add.reduceat(arr, ptr[:-1], axis=-1)
+
+def noise_mix(Q, ptr, epsilon):
+    """Mix Q-values with the mean of their segment (epsilon noise).
+
+    Parameters
+    ----------
+    Q : array, shape (..., n)
+        Noiseless Q-values.
+    ptr : array, shape (n_segments + 1,)
+        Segment offsets (i.e. the Q-values of each state).
+    epsilon : float
+        Probability that the intended action is replaced by a uniformly 
+        random action of the same state.
+
+    Returns
+    -------
+    Q : array, shape (..., n)
+        Q-values, i.e. (1 - epsilon) * Q + epsilon * mean(Q) within segments.
+    """
+    if not epsilon: return Q
+    k = np.diff(ptr)
+    return (1 - epsilon) * Q + epsilon * np.repeat(segment_sum(Q, ptr) / k, k, axis=-1)
+
+def segment_values(Q, ptr, policy, beta=None, w=None, owner=None):
+    """Reduce segments of Q-values to state values under a learning rule.
+
+    Parameters
+    ----------
+    Q : array, shape (..., n)
+        Q-values.
+    ptr : array, shape (n_segments + 1,)
+        Segment offsets.
+    policy : max | min | softmax | pessimism
+        Learning rule.
+    beta : float | array
+        Inverse temperature (broadcast against leading dimensions of Q).
+    w : float | array
+        Pessimism weight (broadcast against leading dimensions of Q).
+    owner : array, shape (n,)
+        Segment of each Q-value (computed if not provided).
+
+    Returns
+    -------
+    V : array, shape (..., n_segments)
+        State values.
+    """
+
+    if policy == 'max':
+        return segment_max(Q, ptr)
+
+    elif policy == 'min':
+        return segment_min(Q, ptr)
+
+    elif policy == 'pessimism':
+        return w * segment_max(Q, ptr) + (1 - w) * segment_min(Q, ptr)
+
+    elif policy == 'softmax':
+        if owner is None: owner = np.repeat(np.arange(ptr.size - 1), np.diff(ptr))
+        z = Q * beta
+        z = np.exp(z - segment_max(z, ptr)[..., owner])
+        return segment_sum(Q * z, ptr) / segment_sum(z, ptr)
+
+    else:
+        raise ValueError('Policy "%s" not valid!' %policy)
+
+def state_values(Q, gym, policy, beta=None, w=None):
+    """Compute successor state values from Q-values.
+
+    Parameters
+    ----------
+    Q : array, shape (..., n_actions)
+        Q-values.
+    gym : GraphWorld instance
+        Simulation environment.
+    policy : max | min | softmax | pessimism
+        Learning rule.
+    beta : float | array
+        Inverse temperature (broadcast against leading dimensions of Q).
+    w : float | array
+        Pessimism weight (broadcast against leading dimensions of Q).
+
+    Returns
+    -------
+    V : array, shape (..., n_states)
+        State values.
+    """
+    return segment_values(Q, gym.a_ptr, policy, beta=beta, w=w, owner=gym.S)
+
+def q_backup(V, gym, gamma):
+    """Compute Q-values from successor state values.
+
+    Parameters
+    ----------
+    V : array, shape (..., n_states)
+        State values.
+    gym : GraphWorld instance
+        Simulation environment.
+    gamma : float | array
+        Temporal discounting factor (broadcast against leading dimensions of V).
+
+    Returns
+    -------
+    Q : array, shape (..., n_actions)
+        Q-values (including epsilon noise).
+    """
+    Q = segment_sum(gym.probs * (gym.rewards + gamma * V[..., gym.S_prime]), gym.o_ptr)
+    return noise_mix(Q, gym.a_ptr, gym.epsilon)
+
+def subset_index(ptr, ix):
+    """Element indices and offsets of a subset of segments.
+
+    Parameters
+    ----------
+    ptr : array, shape (n_segments + 1,)
+        Segment offsets.
+    ix : array
+        Indices of retained segments.
+
+    Returns
+    -------
+    idx : array
+        Indices of the elements of the retained segments.
+    sub_ptr : array, shape (len(ix) + 1,)
+        Segment offsets within idx.
+    """
+    n = np.diff(ptr)[ix]
+    sub_ptr = np.append(0, np.cumsum(n))
+    idx = np.repeat(ptr[ix] - sub_ptr[:-1], n) + np.arange(sub_ptr[-1])
+    return idx, sub_ptr
+
+def subset_values(Q, gym, states, policy, beta=None, w=None):
+    """Compute state values for a subset of states (see state_values)."""
+    a, ptr = subset_index(gym.a_ptr, states)
+    return segment_values(Q[..., a], ptr, policy, beta=beta, w=w)
+
+def subset_backup(V, gym, actions, gamma):
+    """Compute Q-values for a subset of Q-values (see q_backup).
+    
+    With epsilon noise, the subset must contain all Q-values of its states
+    (grouped by state)."""
+    o, ptr = subset_index(gym.o_ptr, actions)
+    Q = segment_sum(gym.probs[o] * (gym.rewards[o] + gamma * V[..., gym.S_prime[o]]), ptr)
+    if not gym.epsilon: return Q
+    a_ptr = np.append(np.flatnonzero(np.diff(gym.S[actions], prepend=-1)), actions.size)
+    return noise_mix(Q, a_ptr, gym.epsilon)
+
+def segment_table(ptr):
+    """Padded index table of segments.
+
+    Parameters
+    ----------
+    ptr : array, shape (n_segments + 1,)
+        Segment offsets.
+
+    Returns
+    -------
+    table : array, shape (n_segments, max_size)
+        Indices of the elements of each segment (padded by repeating the
+        first element of the segment).
+    mask : array, shape (n_segments, max_size)
+        True for valid (non-padded) entries.
+    """
+    k = np.diff(ptr)
+    mask = np.arange(k.max()) < k[:,np.newaxis]
+    table = np.where(mask, ptr[:-1,np.newaxis] + np.arange(k.max()), ptr[:-1,np.newaxis])
+    return table, mask
+
+def table_values(q, mask, policy, beta=None, w=None):
+    """Compute state values from padded Q-values (see segment_table).
+
+    Parameters
+    ----------
+    q : array, shape (n, max_size)
+        Padded Q-values.
+    mask : array, shape (n, max_size)
+        True for valid (non-padded) entries.
+    policy : max | min | softmax | pessimism
+        Learning rule.
+    beta : float
+        Inverse temperature.
+    w : float
+        Pessimism weight.
+
+    Returns
+    -------
+    V : array, shape (n,)
+        State values.
+    """
+
+    if policy == 'max':
+        return np.where(mask, q, -np.inf).max(axis=-1)
+
+    elif policy == 'min':
+        return np.where(mask, q, np.inf).min(axis=-1)
+
+    elif policy == 'pessimism':
+        return w * np.where(mask, q, -np.inf).max(axis=-1) + \
+               (1 - w) * np.where(mask, q, np.inf).min(axis=-1)
+
+    elif policy == 'softmax':
+        z = np.where(mask, q * beta, -np.inf)
+        z = np.exp(z - z.max(axis=-1, keepdims=True))
+        return (np.where(mask, q, 0) * z).sum(axis=-1) / z.sum(axis=-1)
+
+    else:
+        raise ValueError('Policy "%s" not valid!' %policy)
+
+@njit(cache=True)
+def learning_rule(q, policy, beta, w):
+    """Value of a state under a learning rule (see POLICIES)."""
+    if policy == 0: 
+        return q.max()
+    elif policy == 1: 
+        return q.min()
+    elif policy == 2:
+        z = np.exp(q * beta - np.max(q * beta))
+        return (q * z).sum() / z.sum()
+    else:
+        return w * q.max() + (1 - w) * q.min()
+
+@njit(cache=True)
+def _q_value(a, V, o_ptr, S_prime, rewards, probs, gamma):
+    """Bellman backup of a single Q-value."""
+    q = 0.0
+    for o in range(o_ptr[a], o_ptr[a+1]):
+        q += probs[o] * (rewards[o] + gamma * V[S_prime[o]])
+    return q
+
+@njit(cache=True)
+def _state_backup(s, V, a_ptr, o_ptr, S_prime, rewards, probs, gamma, epsilon, out):
+    """Bellman backup of the Q-values of a single state (including epsilon noise).
+    
+    Q-values are written to (and returned as a view of) the buffer out."""
+    q = out[:a_ptr[s+1] - a_ptr[s]]
+    for i in range(q.size):
+        q[i] = _q_value(a_ptr[s] + i, V, o_ptr, S_prime, rewards, probs, gamma)
+    if epsilon > 0: 
+        m = q.mean()
+        for i in range(q.size): q[i] = (1 - epsilon) * q[i] + epsilon * m
+    return q
+
+@njit(cache=True)
+def _state_values(Q, a_ptr, policy, beta, w):
+    """State values of all states under a learning rule."""
+    V = np.empty(a_ptr.size - 1)
+    for s in range(V.size):
+        V[s] = learning_rule(Q[a_ptr[s]:a_ptr[s+1]], policy, beta, w)
+    return V
+
+@njit(cache=True)
+def gauss_seidel(Q, a_ptr, o_ptr, S_prime, rewards, probs, epsilon, policy, gamma, beta, w, tol, 
+                 max_iter):
+    """In-place Gauss-Seidel value iteration.
+    
+    States are updated in alternating backward / forward sweeps, each backup
+    using the most recent values of its successors. Returns the number of
+    sweeps and the number of Q-value backups.
+    """
+    V = _state_values(Q, a_ptr, policy, beta, w)
+    n_states = V.size
+    n_backups = 0
+    buf = np.empty(np.diff(a_ptr).max())
+    
+    for k in range(max_iter):
+        
+        delta = 0.0
+        for i in range(n_states):
+            
+            ## Alternate sweep direction.
+            s = n_states - 1 - i if k % 2 == 0 else i
+            
+            ## Update Q-values of state.
+            q = _state_backup(s, V, a_ptr, o_ptr, S_prime, rewards, probs, gamma, epsilon, buf)
+            for j in range(q.size):
+                delta = max(delta, abs(q[j] - Q[a_ptr[s] + j]))
+                Q[a_ptr[s] + j] = q[j]
+            n_backups += a_ptr[s+1] - a_ptr[s]
+            
+            ## Update state value.
+            V[s] = learning_rule(Q[a_ptr[s]:a_ptr[s+1]], policy, beta, w)
+            
+        ## Check for termination.
+        if delta < tol: break
+            
+    return k + 1, n_backups
+
+def partition_states(a_ptr, n_parts):
+    """Split states into contiguous blocks with similar numbers of Q-values.
+    
+    Returns
+    -------
+    bounds : array, shape (n_blocks + 1,)
+        Block i holds states bounds[i] to bounds[i+1] (empty blocks removed).
+    """
+    cuts = np.searchsorted(a_ptr, np.linspace(0, a_ptr[-1], n_parts + 1)[1:-1])
+    return np.unique(np.concatenate([[0], cuts, [a_ptr.size - 1]]))
+
+@njit(cache=True, parallel=True)
+def parallel_jacobi(Q, a_ptr, o_ptr, S_prime, rewards, probs, epsilon, policy, gamma, beta, w, 
+                    tol, max_iter, bounds):
+    """Synchronous (Jacobi) value iteration with states partitioned across threads.
+    
+    Within a sweep, each block of states (see partition_states) is backed up
+    by one thread from the state values of the previous sweep, such that
+    threads share Q and V without locking. Threads synchronize only at the end
+    of each sweep, when per-block residuals are reduced for the convergence 
+    check. Every state must have at least one Q-value (as enforced by 
+    GraphWorld). Returns the number of sweeps.
+    """
+    n_blocks = bounds.size - 1
+    V = _state_values(Q, a_ptr, policy, beta, w)
+    V_new = np.empty_like(V)
+    buf = np.empty((n_blocks, np.diff(a_ptr).max()))
+    delta = np.zeros(n_blocks)
+    
+    for k in range(max_iter):
+        
+        ## Back up blocks of states in parallel.
+        for b in prange(n_blocks):
+            d = 0.0
+            for s in range(bounds[b], bounds[b+1]):
+                q = _state_backup(s, V, a_ptr, o_ptr, S_prime, rewards, probs, gamma, epsilon, 
+                                  buf[b])
+                for i in range(q.size):
+                    d = max(d, abs(q[i] - Q[a_ptr[s] + i]))
+                    Q[a_ptr[s] + i] = q[i]
+                V_new[s] = learning_rule(Q[a_ptr[s]:a_ptr[s+1]], policy, beta, w)
+            delta[b] = d
+        V, V_new = V_new, V
+            
+        ## Check for termination.
+        if delta.max() < tol: break
+            
+    return k + 1
+
+@njit(cache=True)
+def _residual(s, Q, V, a_ptr, o_ptr, S_prime, rewards, probs, gamma, epsilon, buf):
+    """Bellman residual of a state (max over its Q-values)."""
+    q = _state_backup(s, V, a_ptr, o_ptr, S_prime, rewards, probs, gamma, epsilon, buf)
+    r = 0.0
+    for i in range(q.size): r = max(r, abs(q[i] - Q[a_ptr[s] + i]))
+    return r
+
+@njit(cache=True)
+def prioritized_sweeping(Q, S, a_ptr, o_ptr, S_prime, rewards, probs, epsilon, p_ptr, pred, 
+                         policy, gamma, beta, w, tol, max_backups):
+    """In-place prioritized sweeping value iteration.
+    
+    States are kept in a priority queue ordered by Bellman residual. Popping a
+    state backs up its Q-values, after which only the residuals of predecessor
+    states (p_ptr / pred: state-to-predecessor-action index) are recomputed.
+    Returns the number of Q-value backups and whether all residuals are below
+    tolerance.
+    """
+    V = _state_values(Q, a_ptr, policy, beta, w)
+    n_states = V.size
+    buf = np.empty(np.diff(a_ptr).max())
+    
+    ## Initialize priority queue.
+    priority = np.zeros(n_states)
+    heap = [(0.0, 0)]
+    heappop(heap)
+    for s in range(n_states):
+        priority[s] = _residual(s, Q, V, a_ptr, o_ptr, S_prime, rewards, probs, gamma, epsilon, 
+                                buf)
+        if priority[s] >= tol: heappush(heap, (-priority[s], s))
+            
+    n_backups = 0
+    while len(heap) and n_backups < max_backups:
+        
+        ## Pop state with largest residual (skip stale entries).
+        p, s = heappop(heap)
+        if -p != priority[s]: continue
+        priority[s] = 0.0
+            
+        ## Update Q-values of state.
+        Q[a_ptr[s]:a_ptr[s+1]] = _state_backup(s, V, a_ptr, o_ptr, S_prime, rewards, probs, 
+                                               gamma, epsilon, buf)
+        n_backups += a_ptr[s+1] - a_ptr[s]
+        
+        ## Update state value.
+        v = learning_rule(Q[a_ptr[s]:a_ptr[s+1]], policy, beta, w)
+        if v == V[s]: continue
+        V[s] = v
+        
+        ## Update priorities of predecessors.
+        for i in range(p_ptr[s], p_ptr[s+1]):
+            s_pred = S[pred[i]]
+            r = _residual(s_pred, Q, V, a_ptr, o_ptr, S_prime, rewards, probs, gamma, 
+                          epsilon, buf)
+            if r != priority[s_pred]:
+                priority[s_pred] = r
+                if r >= tol: heappush(heap, (-r, s_pred))
+                    
+    return n_backups, len(heap) == 0
+
+def predecessors(gym):
+    """State-to-predecessor index.
+    
+    Returns
+    -------
+    p_ptr : array, shape (n_states + 1,)
+        The predecessors of state s are stored in positions p_ptr[s] to p_ptr[s+1].
+    pred : array
+        Q-values with an outcome leading to each state (duplicates removed).
+    """
+    
+    ## Define (successor, action) pairs.
+    owner = np.repeat(np.arange(gym.n_actions), np.diff(gym.o_ptr))
+    pairs = np.unique(np.column_stack([gym.S_prime, owner]), axis=0)
+    
+    ## Define index.
+    p_ptr = np.append(0, np.cumsum(np.bincount(pairs[:,0], minlength=gym.n_states)))
+    return p_ptr, pairs[:,1]
@@ -2,7 +2,17 @@
 
 import numpy as np
 from copy import deepcopy
+from numba import get_num_threads
+from pandas import DataFrame
 from ._misc import check_params, softmax, pessimism
+from ._policy import greedy_policy, greedy_paths
+from ._backup import POLICIES, state_values, q_backup, segment_max, segment_sum
+from ._backup import segment_values, subset_index, subset_values, subset_backup
+from ._backup import gauss_seidel, prioritized_sweeping, predecessors, noise_mix, table_values
+from ._backup import parallel_jacobi, partition_states
+from ._grad import sensitivities, value_jacobian, successor_matrix
+from ._multigrid import block_aggregation, coarse_correction
+from ._graph import transition_graph, absorbing_states, topological_levels, condensation_levels
 from warnings import warn
 
 class ValueIteration(object):
@@ -22,13 +32,40 @@ class ValueIteration(object):
         Tolerance for stopping criteria.
     max_iter : int, default: 100
         Maximum number of iterations taken for the solvers to converge.
+    backend : vectorized | parallel | reference (default = vectorized)
+        Implementation of the Bellman backup. The parallel backend runs Jacobi
+        sweeps in a compiled kernel, splitting the states of each sweep across 
+        threads (set via numba.set_num_threads or NUMBA_NUM_THREADS). The 
+        reference backend loops over states and Q-values in Python and is 
+        retained for validation.
+    method : jacobi | gauss-seidel | prioritized | backward | scc | multigrid | tree | auto
+        (default = jacobi)
+        Update scheme. Jacobi performs synchronous sweeps (using backend). 
+        Gauss-Seidel updates Q-values in place, alternating backward and forward 
+        sweeps over states. Prioritized sweeping backs up states in order of their 
+        Bellman residual, updating only the predecessors of changed states. Backward
+        induction computes exact Q-values in a single pass over the states in reverse
+        topological order (acyclic environments only, excepting absorbing states). 
+        SCC decomposes the environment into strongly connected components, which are 
+        solved in reverse topological order with sweeps restricted to each cyclic 
+        component. Multigrid alternates Gauss-Seidel sweeps with corrections solved 
+        over blocks of grid tiles (grid worlds only), such that the number of 
+        cycles (stored as n_cycles and limited by max_iter) is nearly independent 
+        of the size of the grid. Tree solves decision trees stored in heap order 
+        (see DecisionTree) level by level, using only index arithmetic. Auto uses 
+        the tree solver for heap-ordered trees, backward induction if the 
+        environment is acyclic and SCC decomposition otherwise. The number of 
+        Q-value backups performed is stored as n_backups. For prioritized sweeping
+        and multigrid, n_iter is the equivalent number of sweeps (n_backups divided
+        by the number of Q-values).
 
     References
     ----------
     1. Sutton, R. S., & Barto, A. G. (2018). Reinforcement learning: An introduction. MIT press.
     """
     
-    def __init__(self, policy='pessimism', gamma=0.9, beta=10.0, w=1.0, tol=0.0001, max_iter=100):
+    def __init__(self, policy='pessimism', gamma=0.9, beta=10.0, w=1.0, tol=0.0001, max_iter=100,
+                 backend='vectorized', method='jacobi'):
 
         ## Define choice policy.
         self.policy = policy
@@ -48,6 +85,19 @@ class ValueIteration(object):
         self.tol = tol
         self.max_iter = max_iter
         
+        ## Define backup implementation.
+        self.backend = backend
+        if backend == 'vectorized': self._backup = self._vectorized_backup
+        elif backend == 'reference': self._backup = self._reference_backup
+        elif backend == 'parallel': self._backup = None
+        else: raise ValueError('Backend "%s" not valid!' %self.backend)
+        
+        ## Define update scheme.
+        self.method = method
+        if not method in ['jacobi', 'gauss-seidel', 'prioritized', 'backward', 'scc', 'tree', 
+                          'multigrid', 'auto']:
+            raise ValueError('Method "%s" not valid!' %self.method)
+        
     def __repr__(self):
         return '<Q-value iteration>'
             
@@ -55,13 +105,55 @@ class ValueIteration(object):
         """Return copy of agent."""
         return deepcopy(self)
         
-    def _q_solve(self, info, Q=None):
+    def _reference_backup(self, gym, q):
+        """Perform one synchronous Bellman backup (Python loops)."""
+        
+        ## Precompute successor value. 
+        V_prime = np.array([self._policy(q[gym.a_ptr[s]:gym.a_ptr[s+1]]) 
+                            for s in range(gym.n_states)])
+
+        ## Compute Q-values.
+        Q = np.zeros_like(q)
+        for i in range(gym.n_actions):
+            
+            ## Identify outcomes.
+            o = slice(gym.o_ptr[i], gym.o_ptr[i+1])
+                                    
+            ## Update Q-value.
+            Q[i] = sum(gym.probs[o] * (gym.rewards[o] + self.gamma * V_prime[gym.S_prime[o]]))
+            
+        ## Mix with random actions (epsilon noise).
+        if gym.epsilon:
+            Q = np.concatenate([(1 - gym.epsilon) * Q[gym.a_ptr[s]:gym.a_ptr[s+1]] + 
+                                gym.epsilon * Q[gym.a_ptr[s]:gym.a_ptr[s+1]].mean()
+                                for s in range(gym.n_states)])
+            
+        return Q
+    
+    def _vectorized_backup(self, gym, q):
+        """Perform one synchronous Bellman backup (array operations)."""
+        
+        ## Precompute successor value (segmented reduction over states).
+        V_prime = state_values(q, gym, self.policy, beta=self.beta, w=self.w)
+        
+        ## Compute Q-values (gather-multiply-sum over successors).
+        return q_backup(V_prime, gym, self.gamma)
+        
+    def _q_solve(self, gym, Q=None):
         """Solve for Q-values iteratively."""
         
         ## Initialize Q-values.
-        if Q is None: Q = np.zeros(info.shape[0], dtype=float)
-        assert np.equal(Q.shape, info.shape[0])
-        copy = info.copy()
+        if Q is None: Q = np.zeros(gym.n_actions, dtype=float)
+        assert np.equal(Q.shape, gym.n_actions)
+        
+        ## Run compiled sweeps (one block of states per thread).
+        if self.backend == 'parallel':
+            Q = np.array(Q, dtype=float)
+            bounds = partition_states(gym.a_ptr, get_num_threads())
+            n_iter = parallel_jacobi(Q, gym.a_ptr, gym.o_ptr, gym.S_prime, gym.rewards, gym.probs,
+                                     gym.epsilon, POLICIES[self.policy], self.gamma, self.beta, 
+                                     self.w, self.tol, self.max_iter, bounds)
+            return Q, n_iter
             
         ## Main loop.
         for k in range(self.max_iter):
@@ -69,15 +161,8 @@ class ValueIteration(object):
             ## Make copy.
             q = Q.copy()
             
-            ## Precompute successor value. 
-            copy['Q'] = q
-            V_prime = copy.groupby('S').Q.apply(self._policy).values
-
             ## Compute Q-values.
-            for i in range(info.shape[0]):
-                                        
-                ## Update Q-value.
-                Q[i] = sum(info.loc[i,"T"] * (info.loc[i,"R"] + self.gamma * V_prime[info.loc[i,"S'"]]))
+            Q = self._backup(gym, q)
 
             ## Compute delta.
             delta = np.abs(Q - q)
@@ -87,43 +172,207 @@ class ValueIteration(object):
            
         return Q, k + 1
     
-    def _v_solve(self, info):
-        """Compute state value from Q-table."""
+    def _gs_solve(self, gym, Q=None):
+        """Solve for Q-values by in-place Gauss-Seidel sweeps."""
         
-        ## Copy info and append Q-values.
-        copy = info.copy()
-        copy['Q'] = self.Q
+        ## Initialize Q-values.
+        Q = np.zeros(gym.n_actions, dtype=float) if Q is None else np.array(Q, dtype=float)
+        assert np.equal(Q.shape, gym.n_actions)
         
-        ## Identify max by state.
-        return copy.groupby('S').Q.max().values
+        ## Main loop.
+        n_iter, n_backups = gauss_seidel(Q, gym.a_ptr, gym.o_ptr, gym.S_prime, gym.rewards, 
+                                         gym.probs, gym.epsilon, POLICIES[self.policy], 
+                                         self.gamma, self.beta, self.w, self.tol, self.max_iter)
+        return Q, n_iter, n_backups
+    
+    def _ps_solve(self, gym, Q=None):
+        """Solve for Q-values by prioritized sweeping."""
         
-    def _pi_solve(self, gym):
-        """Compute policy from Q-table."""
+        ## Initialize Q-values.
+        Q = np.zeros(gym.n_actions, dtype=float) if Q is None else np.array(Q, dtype=float)
+        assert np.equal(Q.shape, gym.n_actions)
         
-        ## Precompute optimal q(s,a).
-        copy = gym.info.copy()
-        copy['Q'] = self.Q
-        copy = copy.iloc[copy.groupby('S').Q.idxmax().values]
-        copy["S'"] = copy["S'"].apply(lambda arr: arr[0])
+        ## Main loop (budget equivalent to max_iter sweeps).
+        p_ptr, pred = predecessors(gym)
+        n_backups, converged = prioritized_sweeping(Q, gym.S, gym.a_ptr, gym.o_ptr, gym.S_prime, 
+                                                    gym.rewards, gym.probs, gym.epsilon, p_ptr, 
+                                                    pred, POLICIES[self.policy], self.gamma, 
+                                                    self.beta, self.w, self.tol, 
+                                                    self.max_iter * gym.n_actions)
         
-        ## Initialize policy from initial state.
-        policy = [gym.start]
+        ## Convert to equivalent number of sweeps.
+        n_iter = int(np.ceil(n_backups / gym.n_actions)) if converged else self.max_iter
+        return Q, n_iter, n_backups
+    
+    def _mg_solve(self, gym, Q=None, n_sweeps=4):
+        """Solve for Q-values by two-level (block aggregation) multigrid cycles."""
         
-        ## Iterately append.
-        while True:
-
-            ## Termination check.
-            s = policy[-1]
-            if s in gym.terminal: break
+        ## Initialize Q-values.
+        Q = np.zeros(gym.n_actions, dtype=float) if Q is None else np.array(Q, dtype=float)
+        assert np.equal(Q.shape, gym.n_actions)
+        
+        ## Define coarse grid.
+        labels = block_aggregation(gym)
+        CS = successor_matrix(gym)
+        n_backups = 0
+        
+        ## Main loop.
+        for k in range(self.max_iter):
+            
+            ## Make copy.
+            q = Q.copy()
+            
+            ## Coarse-grid correction (propagates values across blocks).
+            Q = coarse_correction(Q, gym, labels, self.policy, self.gamma, beta=self.beta, w=self.w,
+                                  CS=CS)
+            
+            ## Smooth by Gauss-Seidel sweeps (propagates values within blocks).
+            _, n = gauss_seidel(Q, gym.a_ptr, gym.o_ptr, gym.S_prime, gym.rewards, gym.probs, 
+                                gym.epsilon, POLICIES[self.policy], self.gamma, self.beta, 
+                                self.w, self.tol, n_sweeps)
+            n_backups += n + 2 * gym.n_actions
+            
+            ## Check for termination.
+            converged = np.all(np.abs(Q - q) < self.tol)
+            if converged: break
+        
+        ## Convert to equivalent number of sweeps.
+        n_iter = int(np.ceil(n_backups / gym.n_actions)) if converged else self.max_iter
+        return Q, n_iter, n_backups, k + 1
+    
+    def _absorbing_solve(self, gym, states, Q, V):
+        """Solve absorbing states in closed form: V = policy(r) / (1 - gamma)."""
+        
+        ## Compute expected one-step rewards.
+        a, ptr = subset_index(gym.a_ptr, states)
+        r = subset_backup(V, gym, a, 0)
+        v = segment_values(r, ptr, self.policy, beta=self.beta, w=self.w)
+        if self.gamma == 1 and np.any(v != 0):
+            raise ValueError('Absorbing states with non-zero reward require gamma < 1.')
+        
+        ## Update values.
+        V[states] = 0 if self.gamma == 1 else v / (1 - self.gamma)
+        Q[a] = r + self.gamma * V[gym.S[a]]
+        return Q, V
+    
+    def _bi_solve(self, gym):
+        """Solve for Q-values by backward induction."""
+        
+        ## Identify absorbing states and topological order.
+        absorbing = absorbing_states(gym)
+        levels = topological_levels(transition_graph(gym), absorbing)
+        if levels is None: raise ValueError('Backward induction requires an acyclic environment.')
+            
+        ## Initialize values.
+        Q = np.zeros(gym.n_actions, dtype=float)
+        V = np.zeros(gym.n_states, dtype=float)
+        
+        ## Solve absorbing states.
+        Q, V = self._absorbing_solve(gym, np.flatnonzero(absorbing), Q, V)
+        
+        ## Backward pass over remaining states.
+        for states in levels:
+            states = states[~absorbing[states]]
+            if not states.size: continue
+            a, _ = subset_index(gym.a_ptr, states)
+            Q[a] = subset_backup(V, gym, a, self.gamma)
+            V[states] = subset_values(Q, gym, states, self.policy, beta=self.beta, w=self.w)
+            
+        return Q, 1, gym.n_actions
+    
+    def _tree_solve(self, gym):
+        """Solve for Q-values level by level over a heap-ordered tree."""
+        
+        ## Error-catching.
+        if not hasattr(gym, 'branching') or gym.o_ptr[-1] != gym.n_actions:
+            raise ValueError('Tree solver requires a heap-ordered decision tree.')
+        b = gym.branching
+            
+        ## Initialize values.
+        Q = np.zeros(gym.n_actions, dtype=float)
+        V = np.zeros(gym.n_states, dtype=float)
+        
+        ## Solve leaves (absorbing states).
+        Q, V = self._absorbing_solve(gym, gym.terminal, Q, V)
+        mask = np.ones((1, b), dtype=bool)
+        
+        ## Backward pass over levels (the Q-value of entering node c is Q-value c - 1).
+        for d in range(gym.depth - 1, -1, -1):
+            nodes = gym.level(d)
+            a = slice(b * nodes[0], b * nodes[-1] + b)
+            q = gym.rewards[a] + self.gamma * V[a.start + 1 : a.stop + 1]
+            Q[a] = q = noise_mix(q.reshape(-1, b), np.array([0, b]), gym.epsilon).flatten()
+            V[nodes] = table_values(q.reshape(-1, b), mask, self.policy, beta=self.beta, w=self.w)
+            
+        return Q, 1, gym.n_actions
+    
+    def _scc_solve(self, gym, Q=None):
+        """Solve for Q-values blockwise over strongly connected components."""
+        
+        ## Identify absorbing states and components.
+        absorbing = absorbing_states(gym)
+        levels, cyclic = condensation_levels(transition_graph(gym))
+        
+        ## Initialize values.
+        Q = np.zeros(gym.n_actions, dtype=float) if Q is None else np.array(Q, dtype=float)
+        assert np.equal(Q.shape, gym.n_actions)
+        V = np.zeros(gym.n_states, dtype=float)
+        
+        ## Solve absorbing states.
+        Q, V = self._absorbing_solve(gym, np.flatnonzero(absorbing), Q, V)
+        n_iter, n_backups = 1, 0
+        
+        ## Main loop (components in reverse topological order).
+        for states in levels:
+            
+            ## Single backup of acyclic components.
+            acyclic = states[np.logical_and(~cyclic[states], ~absorbing[states])]
+            if acyclic.size:
+                a, _ = subset_index(gym.a_ptr, acyclic)
+                Q[a] = subset_backup(V, gym, a, self.gamma)
+                V[acyclic] = subset_values(Q, gym, acyclic, self.policy, beta=self.beta, w=self.w)
+                n_backups += a.size
                 
-            ## Observe successor.
-            s_prime, = copy.loc[copy["S"]==s, "S'"].values
+            ## Iterate within cyclic components.
+            states = states[np.logical_and(cyclic[states], ~absorbing[states])]
+            if not states.size: continue
+            a, a_ptr = subset_index(gym.a_ptr, states)
+            o, o_ptr = subset_index(gym.o_ptr, a)
             
-            ## Terminate on loops. Otherwise append.
-            if s_prime in policy: break
-            policy.append(s_prime)
+            for k in range(self.max_iter):
+                
+                ## Make copy.
+                q = Q[a]
                 
-        return policy
+                ## Compute Q-values.
+                V[states] = segment_values(q, a_ptr, self.policy, beta=self.beta, w=self.w)
+                Q[a] = segment_sum(gym.probs[o] * (gym.rewards[o] + self.gamma * V[gym.S_prime[o]]), 
+                                   o_ptr)
+                Q[a] = noise_mix(Q[a], a_ptr, gym.epsilon)
+                
+                ## Check for termination.
+                if np.all(np.abs(Q[a] - q) < self.tol): break
+                    
+            V[states] = segment_values(Q[a], a_ptr, self.policy, beta=self.beta, w=self.w)
+            n_iter, n_backups = max(n_iter, k + 1), n_backups + (k + 1) * a.size
+            
+        return Q, n_iter, n_backups
+    
+    def _v_solve(self, gym, Q=None):
+        """Compute state value from Q-table."""
+        if Q is None: Q = self.Q
+        
+        ## Identify max by state.
+        return segment_max(Q, gym.a_ptr)
+        
+    def _pi_solve(self, gym, Q=None):
+        """Compute policy from Q-table."""
+        if Q is None: Q = self.Q
+        
+        ## Follow greedy policy from initial state.
+        _, successors = greedy_policy(Q, gym)
+        path, = greedy_paths(gym, successors, gym.start)
+        return path[path >= 0].tolist()
             
     def fit(self, gym, Q=None, verbose=True):        
         """Solve for optimal policy.
@@ -139,14 +388,227 @@ class ValueIteration(object):
         """
         
         ## Solve for Q-values.
-        self.Q, self.n_iter = self._q_solve(gym.info, Q)
+        if self.method == 'backward':
+            self.Q, self.n_iter, self.n_backups = self._bi_solve(gym)
+        elif self.method == 'tree' or (self.method == 'auto' and hasattr(gym, 'branching')):
+            self.Q, self.n_iter, self.n_backups = self._tree_solve(gym)
+        elif self.method in ['scc', 'auto']:
+            self.Q, self.n_iter, self.n_backups = self._scc_solve(gym, Q)
+        elif self.method == 'gauss-seidel':
+            self.Q, self.n_iter, self.n_backups = self._gs_solve(gym, Q)
+        elif self.method == 'prioritized':
+            self.Q, self.n_iter, self.n_backups = self._ps_solve(gym, Q)
+        elif self.method == 'multigrid':
+            self.Q, self.n_iter, self.n_backups, self.n_cycles = self._mg_solve(gym, Q)
+        else:
+            self.Q, self.n_iter = self._q_solve(gym, Q)
+            self.n_backups = self.n_iter * gym.n_actions
         if np.equal(self.n_iter, self.max_iter) and verbose:
             warn('Reached maximum iterations.')
         
         ## Solve for values.
-        self.V = self._v_solve(gym.info)
+        self.V = self._v_solve(gym)
         
         ## Compute policy.
         self.pi = self._pi_solve(gym)
                 
+        return self
+    
+    def fit_continuation(self, gym, param, values, Q=None, verbose=True):
+        """Solve for optimal policies along an ordered path of parameter values.
+        
+        Each solve is warm-started by extrapolating the solutions at the two
+        previous values (or from the previous solution, if these values are
+        equal), such that neighboring solutions (which are often nearly 
+        identical) require few iterations to converge.
+        
+        Parameters
+        ----------
+        gym : GraphWorld instance
+            Simulation environment.
+        param : w | gamma | beta
+            Name of the parameter to vary.
+        values : array, shape (n_settings,)
+            Ordered parameter values.
+        Q : array, shape (n_actions,)
+            Initial Q-values of the first solve.
+            
+        Returns
+        -------
+        self : returns an instance of self.
+        
+        Notes
+        -----
+        Results are stored with a leading settings dimension, as in fit_many. The 
+        number of iterations (and backups) of each solve is stored in n_iter (and
+        n_backups). The agent's parameter is restored after the sweep.
+        """
+        
+        ## Error-catching.
+        if not param in ['w', 'gamma', 'beta']:
+            raise ValueError('Parameter "%s" not valid!' %param)
+        values = np.asarray(values, dtype=float)
+        for x in values: check_params(**{param: x})
+        
+        ## Main loop.
+        original = getattr(self, param)
+        Q_path, n_iter, n_backups, maxed = [], [], [], False
+        try:
+            for k, x in enumerate(values):
+                
+                ## Predict solution (secant extrapolation from previous solutions).
+                if k > 1 and values[k-1] != values[k-2]: 
+                    Q = Q_path[-1] + (Q_path[-1] - Q_path[-2]) * \
+                        (x - values[k-1]) / (values[k-1] - values[k-2])
+                elif k: 
+                    Q = Q_path[-1].copy()
+                    
+                ## Warm-start solve.
+                setattr(self, param, x)
+                self.fit(gym, Q=None if Q is None else Q.copy(), verbose=False)
+                Q = self.Q
+                
+                ## Store.
+                Q_path.append(Q)
+                n_iter.append(self.n_iter)
+                n_backups.append(self.n_backups)
+                maxed |= np.equal(self.n_iter, self.max_iter)
+        finally:
+            setattr(self, param, original)
+        
+        if maxed and verbose:
+            warn('Reached maximum iterations.')
+            
+        ## Store results.
+        self.Q = np.array(Q_path)
+        self.n_iter, self.n_backups = np.array(n_iter), np.array(n_backups)
+        settings = dict(w=self.w, gamma=self.gamma, beta=self.beta)
+        settings[param] = values
+        self.settings = DataFrame(settings, index=np.arange(values.size), 
+                                  columns=('w','gamma','beta'))
+        
+        ## Solve for values.
+        self.V = self._v_solve(gym)
+        
+        ## Compute policies.
+        _, successors = greedy_policy(self.Q, gym)
+        self.pi = [path[path >= 0].tolist() for path in greedy_paths(gym, successors, gym.start)[:,0]]
+        
+        return self
+    
+    def sensitivities(self, gym, params=('w', 'gamma')):
+        """Derivatives of the fitted Q-values and state values with respect to 
+        agent parameters (by implicit differentiation of the Bellman fixed point).
+        
+        Parameters
+        ----------
+        gym : GraphWorld instance
+            Simulation environment (as passed to fit).
+        params : list
+            Parameters (w, gamma, beta) to differentiate with respect to.
+            
+        Returns
+        -------
+        self : returns an instance of self.
+        
+        Notes
+        -----
+        Derivatives are stored in the dictionaries dQ and dV, keyed by parameter. 
+        Each requires one sparse linear solve (sharing a single factorization). 
+        Derivatives are exact where the greedy (and pessimistic) choices are 
+        unique; at ties, the first maximum (minimum) is used.
+        """
+        
+        ## Differentiate Q-values.
+        self.dQ = sensitivities(self.Q, gym, self.policy, self.gamma, beta=self.beta, w=self.w,
+                                params=params)
+        
+        ## Differentiate state values (i.e. maximum Q-value of each state).
+        J, _ = value_jacobian(self.Q, gym, 'max')
+        self.dV = {k: J @ v for k, v in self.dQ.items()}
+        
+        return self
+    
+    def fit_many(self, gym, w=None, gamma=None, beta=None, Q=None, verbose=True):
+        """Solve for optimal policies under many parameter settings at once.
+        
+        All combinations of the parameter values are solved simultaneously as 
+        a stacked Q-table sharing the transition structure of the environment.
+        Each setting stops updating once it has converged, so that results are 
+        identical to calling fit once per setting with method = jacobi and 
+        backend = vectorized. The agent's method and backend are ignored: for 
+        other update schemes, fit_many agrees with fit only to within tol, and
+        n_iter counts Jacobi sweeps.
+        
+        Parameters
+        ----------
+        gym : GridWorld instance
+            Simulation environment.
+        w : float | array
+            Pessimism weights. Defaults to agent value.
+        gamma : float | array
+            Temporal discounting factors. Defaults to agent value.
+        beta : float | array
+            Inverse temperatures. Defaults to agent value.
+        Q : array, shape (n_actions,) or (n_settings, n_actions)
+            Initial Q-values.
+            
+        Returns
+        -------
+        self : returns an instance of self.
+        
+        Notes
+        -----
+        Results are stored with a leading settings dimension, i.e. Q has shape
+        (n_settings, n_actions), V has shape (n_settings, n_states), pi is a list
+        of policies and n_iter is an array. The parameter values of each setting
+        are stored in the settings DataFrame.
+        """
+        
+        ## Define parameter grid.
+        params = [np.atleast_1d(default if arr is None else arr).astype(float) 
+                  for arr, default in zip([w, gamma, beta], [self.w, self.gamma, self.beta])]
+        w, gamma, beta = [arr.flatten() for arr in np.meshgrid(*params, indexing='ij')]
+        for x in params[0]: check_params(w=x)
+        for x in params[1]: check_params(gamma=x)
+        for x in params[2]: check_params(beta=x)
+        
+        ## Initialize Q-values.
+        n_settings = w.size
+        if Q is None: Q = np.zeros((n_settings, gym.n_actions), dtype=float)
+        else: Q = np.array(np.broadcast_to(Q, (n_settings, gym.n_actions)), dtype=float)
+        n_iter = np.zeros(n_settings, dtype=int)
+        
+        ## Main loop.
+        active = np.arange(n_settings)
+        for k in range(self.max_iter):
+            
+            ## Make copy.
+            q = Q[active]
+            
+            ## Compute Q-values.
+            V_prime = state_values(q, gym, self.policy, beta=beta[active,np.newaxis], 
+                                   w=w[active,np.newaxis])
+            Q[active] = q_backup(V_prime, gym, gamma[active,np.newaxis])
+            n_iter[active] = k + 1
+            
+            ## Check for termination (per setting).
+            converged = np.all(np.abs(Q[active] - q) < self.tol, axis=-1)
+            active = active[~converged]
+            if not active.size: break
+                
+        if active.size and verbose:
+            warn('Reached maximum iterations.')
+            
+        ## Store results.
+        self.Q, self.n_iter = Q, n_iter
+        self.settings = DataFrame(dict(w=w, gamma=gamma, beta=beta), columns=('w','gamma','beta'))
+        
+        ## Solve for values.
+        self.V = self._v_solve(gym)
+        
+        ## Compute policies.
+        _, successors = greedy_policy(Q, gym)
+        self.pi = [path[path >= 0].tolist() for path in greedy_paths(gym, successors, gym.start)[:,0]]
+        
         return self
\ No newline at end of file
@@ -0,0 +1,152 @@
+"""Implicit differentiation module"""
+
+import numpy as np
+from scipy.sparse import csr_matrix, identity
+from scipy.sparse.linalg import splu
+from ._backup import segment_max, segment_sum, state_values
+
+def _first_extremum(Q, gym, V):
+    """Index of the first Q-value of each state equal to V."""
+    ix = np.where(Q == V[gym.S], np.arange(gym.n_actions), gym.n_actions)
+    return np.minimum.reduceat(ix, gym.a_ptr[:-1])
+
+def successor_matrix(gym):
+    """Sparse action-to-successor transition matrix.
+
+    Parameters
+    ----------
+    gym : GraphWorld instance
+        Simulation environment.
+
+    Returns
+    -------
+    CS : csr_matrix, shape (n_actions, n_states)
+        Probability of each successor state given each Q-value (including 
+        epsilon noise), such that Q-values are backed up as r + gamma * CS @ V
+        (r: expected one-step rewards).
+    """
+    n = gym.S_prime.size
+    owner = np.repeat(np.arange(gym.n_actions), np.diff(gym.o_ptr))
+    C = csr_matrix((gym.probs, (owner, np.arange(n))), shape=(gym.n_actions, n))
+    Sel = csr_matrix((np.ones(n), (np.arange(n), gym.S_prime)), shape=(n, gym.n_states))
+    CS = (C @ Sel).tocsr()
+    if gym.epsilon:
+        D = csr_matrix((1 / np.diff(gym.a_ptr)[gym.S], (gym.S, np.arange(gym.n_actions))), 
+                       shape=(gym.n_states, gym.n_actions))
+        CS = ((1 - gym.epsilon) * CS + gym.epsilon * ((D.T > 0).astype(float) @ (D @ CS))).tocsr()
+    return CS
+
+def value_jacobian(Q, gym, policy, beta=None, w=None):
+    """Derivatives of state values with respect to Q-values and parameters.
+
+    Parameters
+    ----------
+    Q : array, shape (n_actions,)
+        Q-values.
+    gym : GraphWorld instance
+        Simulation environment.
+    policy : max | min | softmax | pessimism
+        Learning rule.
+    beta : float
+        Inverse temperature.
+    w : float
+        Pessimism weight.
+
+    Returns
+    -------
+    J : csr_matrix, shape (n_states, n_actions)
+        Jacobian of state values with respect to Q-values. At ties, the first
+        maximum (minimum) of each state is used.
+    dV : dict
+        Partial derivatives of state values with respect to w and beta.
+    """
+    zeros = np.zeros(gym.n_states)
+
+    if policy in ['max', 'min', 'pessimism']:
+        hi = _first_extremum(Q, gym, segment_max(Q, gym.a_ptr))
+        lo = _first_extremum(Q, gym, -segment_max(-Q, gym.a_ptr))
+        if policy == 'max': weights = (np.ones(gym.n_states), zeros)
+        elif policy == 'min': weights = (zeros, np.ones(gym.n_states))
+        else: weights = (np.full(gym.n_states, w), np.full(gym.n_states, 1 - w))
+        J = csr_matrix((np.concatenate(weights), (np.tile(gym.states, 2), np.concatenate([hi, lo]))),
+                       shape=(gym.n_states, gym.n_actions))
+        dw = Q[hi] - Q[lo] if policy == 'pessimism' else zeros
+        return J, dict(w=dw, beta=zeros)
+
+    elif policy == 'softmax':
+        z = np.exp(beta * Q - segment_max(beta * Q, gym.a_ptr)[gym.S])
+        pi = z / segment_sum(z, gym.a_ptr)[gym.S]
+        V = segment_sum(pi * Q, gym.a_ptr)
+        J = csr_matrix((pi * (1 + beta * (Q - V[gym.S])), (gym.S, np.arange(gym.n_actions))),
+                       shape=(gym.n_states, gym.n_actions))
+        dbeta = segment_sum(pi * Q * (Q - V[gym.S]), gym.a_ptr)
+        return J, dict(w=zeros, beta=dbeta)
+
+    else:
+        raise ValueError('Policy "%s" not valid!' %policy)
+
+def sensitivities(Q, gym, policy, gamma, beta=None, w=None, params=('w', 'gamma')):
+    """Derivatives of converged Q-values by implicit differentiation.
+
+    At the fixed point Q = B(Q, theta) of the Bellman backup, the derivative
+    with respect to a parameter theta solves the sparse linear system
+    (I - dB/dQ) dQ/dtheta = dB/dtheta.
+
+    Parameters
+    ----------
+    Q : array, shape (n_actions,)
+        Converged Q-values.
+    gym : GraphWorld instance
+        Simulation environment.
+    policy : max | min | softmax | pessimism
+        Learning rule.
+    gamma : float
+        Temporal discounting factor.
+    beta : float
+        Inverse temperature.
+    w : float
+        Pessimism weight.
+    params : list
+        Parameters (w, gamma, beta) to differentiate with respect to.
+
+    Returns
+    -------
+    dQ : dict
+        Derivatives of Q-values, shape (n_actions,), for each parameter.
+
+    Notes
+    -----
+    Without discounting (gamma = 1), values of terminal states are held fixed,
+    as their self-loops leave the fixed point undetermined. Derivatives are
+    undefined (and an error is raised) if the policy otherwise cycles without
+    discounting.
+    """
+
+    ## Define action-to-successor matrix.
+    CS = successor_matrix(gym)
+
+    ## Compute value derivatives.
+    J, dV = value_jacobian(Q, gym, policy, beta=beta, w=w)
+    V = state_values(Q, gym, policy, beta=beta, w=w)
+    if gamma == 1:
+        fixed = np.in1d(gym.states, gym.terminal)
+        J = csr_matrix(J.multiply(~fixed[:,np.newaxis]))
+        dV = {k: np.where(fixed, 0, v) for k, v in dV.items()}
+        V = np.where(fixed, 0, V)
+
+    ## Define partial derivatives of backup.
+    dB = dict(w=gamma * (CS @ dV['w']), beta=gamma * (CS @ dV['beta']), gamma=CS @ V)
+
+    ## Factorize linear system.
+    try:
+        lu = splu((identity(gym.n_actions) - gamma * CS @ J).tocsc())
+    except RuntimeError:
+        raise ValueError('Fixed point is degenerate (e.g. the policy cycles without discounting).')
+
+    ## Solve for each parameter.
+    dQ = dict()
+    for k in params:
+        if not k in dB: raise ValueError('Parameter "%s" not valid!' %k)
+        dQ[k] = lu.solve(dB[k])
+
+    return dQ
@@ -0,0 +1,117 @@
+"""Transition graph module"""
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+def transition_graph(gym):
+    """State transition graph of an environment.
+
+    Parameters
+    ----------
+    gym : GraphWorld instance
+        Simulation environment.
+
+    Returns
+    -------
+    A : csr_matrix, shape (n_states, n_states)
+        Adjacency matrix. A[s, s'] is True if any Q-value of state s leads to
+        state s' with non-zero probability.
+    """
+    owner = np.repeat(gym.S, np.diff(gym.o_ptr))
+    ix = gym.probs > 0
+    data = np.ones(ix.sum(), dtype=bool)
+    A = csr_matrix((data, (owner[ix], gym.S_prime[ix])), shape=(gym.n_states, gym.n_states))
+    A.sum_duplicates()
+    return A
+
+def absorbing_states(gym):
+    """Identify absorbing states (all outcomes of all Q-values are self-loops)."""
+    owner = np.repeat(gym.S, np.diff(gym.o_ptr))
+    escape = np.logical_and(gym.S_prime != owner, gym.probs > 0)
+    return np.bincount(owner[escape], minlength=gym.n_states) == 0
+
+def topological_levels(A, sinks=None):
+    """Partition the states of a directed acyclic graph by height.
+
+    Parameters
+    ----------
+    A : sparse matrix, shape (n_states, n_states)
+        Adjacency matrix.
+    sinks : array, shape (n_states,)
+        Boolean mask of sink states, whose outgoing edges (e.g. self-loops of
+        absorbing states) are ignored.
+
+    Returns
+    -------
+    levels : list of arrays | None
+        States of height 0, 1, 2, ... where the height of a state is the length
+        of the longest path to a sink. Every state depends only on states of
+        lower height. None if the graph contains a cycle.
+    """
+    A = csr_matrix(A, dtype=int)
+    if sinks is not None: A = csr_matrix(A.multiply(~sinks[:,np.newaxis]))
+    A.eliminate_zeros()
+    AT = A.T.tocsr()
+
+    ## Initialize out-degrees.
+    degree = np.diff(A.indptr)
+    frontier, = np.where(degree == 0)
+
+    ## Peel off levels.
+    levels, n = [], 0
+    while frontier.size:
+        levels.append(frontier)
+        n += frontier.size
+
+        ## Decrement out-degree of predecessors.
+        pred, counts = np.unique(AT[frontier].indices, return_counts=True)
+        degree[pred] -= counts
+        frontier = pred[degree[pred] == 0]
+
+    return levels if n == A.shape[0] else None
+
+def condensation_levels(A):
+    """Partition states by height in the condensation of a directed graph.
+
+    The condensation contracts each strongly connected component to a single
+    node, yielding a directed acyclic graph of components.
+
+    Parameters
+    ----------
+    A : sparse matrix, shape (n_states, n_states)
+        Adjacency matrix.
+
+    Returns
+    -------
+    levels : list of arrays
+        States grouped by the height of their component. Every component
+        depends only on components of lower height.
+    cyclic : array, shape (n_states,)
+        True for states belonging to a cyclic component (i.e. a component with
+        more than one state, or a single state with a self-loop).
+    """
+    A = A.tocoo()
+
+    ## Identify strongly connected components.
+    n_comp, labels = connected_components(A, directed=True, connection='strong')
+
+    ## Identify cyclic components.
+    size = np.bincount(labels, minlength=n_comp)
+    loop = np.bincount(labels[A.row[A.row == A.col]], minlength=n_comp) > 0
+    cyclic = np.logical_or(size > 1, loop)
+
+    ## Define condensation.
+    ix = labels[A.row] != labels[A.col]
+    C = csr_matrix((np.ones(ix.sum(), dtype=bool), (labels[A.row[ix]], labels[A.col[ix]])),
+                   shape=(n_comp, n_comp))
+
+    ## Order components by height.
+    height = np.zeros(n_comp, dtype=int)
+    for h, comps in enumerate(topological_levels(C)): height[comps] = h
+
+    ## Group states by height of component.
+    order = np.argsort(height[labels], kind='stable')
+    levels = np.split(order, np.cumsum(np.bincount(height[labels]))[:-1])
+
+    return levels, cyclic[labels]
@@ -0,0 +1,123 @@
+"""Multigrid value iteration module"""
+
+import numpy as np
+from scipy.sparse import csr_matrix, identity
+from scipy.sparse.linalg import splu
+from ._backup import q_backup, state_values
+from ._grad import successor_matrix, value_jacobian
+
+def block_aggregation(gym, size=None, max_coarse=4096):
+    """Aggregate the states of a grid world into square blocks of tiles.
+
+    Parameters
+    ----------
+    gym : GraphWorld instance
+        Simulation environment with a grid attribute (tiles indexing states,
+        NaNs denoting nonviable tiles). Each state must occupy at most one 
+        tile; states without a tile form blocks of their own.
+    size : int
+        Side length of blocks. Defaults to the smallest power of two yielding
+        at most max_coarse blocks.
+    max_coarse : int
+        Maximum number of blocks (if size is not provided).
+
+    Returns
+    -------
+    labels : array, shape (n_states,)
+        Block of each state.
+    """
+
+    ## Error-catching.
+    if not hasattr(gym, 'grid'):
+        raise ValueError('Block aggregation requires a grid world.')
+    grid = np.asarray(gym.grid, dtype=float)
+    rows, cols = np.where(~np.isnan(grid))
+
+    ## Define state-to-tile index.
+    tiles = grid[rows, cols]
+    if np.any(tiles != np.round(tiles)) or np.any(~np.in1d(tiles, gym.states)):
+        raise ValueError('Grid tiles must index states of the environment.')
+    tiles = tiles.astype(int)
+    if np.unique(tiles).size != tiles.size:
+        raise ValueError('Grid tiles must index distinct states.')
+
+    ## Define block size.
+    if size is None:
+        size = 2
+        while np.ceil(grid.shape[0] / size) * np.ceil(grid.shape[1] / size) > max_coarse:
+            size *= 2
+
+    ## Label blocks (discarding empty blocks).
+    blocks = (rows // size) * int(np.ceil(grid.shape[1] / size)) + cols // size
+    blocks = np.unique(blocks, return_inverse=True)[1]
+    
+    ## Assign states without tiles to blocks of their own.
+    labels = np.full(gym.n_states, -1)
+    labels[tiles] = blocks
+    off = labels < 0
+    labels[off] = blocks.max() + 1 + np.arange(off.sum())
+    return labels
+
+def coarse_correction(Q, gym, labels, policy, gamma, beta=None, w=None, CS=None):
+    """Correct Q-values by solving the Bellman equation over aggregated states.
+
+    The Bellman operator is linearized around the current state values V,
+    such that the error e = V* - V approximately solves (I - gamma P) e = T(V) - V,
+    where T is the Bellman operator and P the state transition matrix of the
+    current (greedy) policy. The error is approximated as constant within
+    blocks, yielding a small system over blocks that is solved directly.
+
+    Parameters
+    ----------
+    Q : array, shape (n_actions,)
+        Q-values.
+    gym : GraphWorld instance
+        Simulation environment.
+    labels : array, shape (n_states,)
+        Block of each state (see block_aggregation).
+    policy : max | min | softmax | pessimism
+        Learning rule.
+    gamma : float
+        Temporal discounting factor.
+    beta : float
+        Inverse temperature.
+    w : float
+        Pessimism weight.
+    CS : csr_matrix, shape (n_actions, n_states)
+        Action-to-successor matrix (see successor_matrix). Computed if not 
+        provided.
+
+    Returns
+    -------
+    Q : array, shape (n_actions,)
+        Corrected Q-values (unchanged if the aggregated system is singular).
+    """
+
+    ## Compute Bellman residual.
+    V = state_values(Q, gym, policy, beta=beta, w=w)
+    Q = q_backup(V, gym, gamma)
+    residual = state_values(Q, gym, policy, beta=beta, w=w) - V
+
+    ## Define transition matrix of current policy (terminal states held fixed).
+    if CS is None: CS = successor_matrix(gym)
+    J, _ = value_jacobian(Q, gym, policy, beta=beta, w=w)
+    P = J @ CS
+    fixed = np.in1d(gym.states, gym.terminal)
+    P = csr_matrix(P.multiply(~fixed[:,np.newaxis]))
+    residual[fixed] = 0
+
+    ## Define restriction (block average) and prolongation (block constant).
+    n = labels.max() + 1
+    size = np.bincount(labels, minlength=n)
+    R = csr_matrix((1 / size[labels], (labels, gym.states)), shape=(n, gym.n_states))
+    I = csr_matrix((np.ones(gym.n_states), (gym.states, labels)), shape=(gym.n_states, n))
+
+    ## Solve aggregated system.
+    try:
+        lu = splu((identity(n) - gamma * (R @ P @ I)).tocsc())
+    except RuntimeError:
+        return Q
+    error = I @ lu.solve(R @ residual)
+
+    ## Back up corrected values.
+    return q_backup(V + residual + gamma * (P @ error), gym, gamma)
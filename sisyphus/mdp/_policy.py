@@ -0,0 +1,142 @@
+"""Greedy policy module"""
+
+import numpy as np
+from ._backup import segment_max, segment_sum
+
+def greedy_policy(Q, gym):
+    """Greedy action and successor of every state.
+
+    Parameters
+    ----------
+    Q : array, shape (..., n_actions)
+        Q-values.
+    gym : GraphWorld instance
+        Simulation environment.
+
+    Returns
+    -------
+    actions : array, shape (..., n_states)
+        Greedy Q-value of each state (first maximum within each state).
+    successors : array, shape (..., n_states)
+        Intended successor of the greedy Q-value of each state.
+    """
+    Q = np.asarray(Q)
+
+    ## Identify first maximum within each state.
+    V = segment_max(Q, gym.a_ptr)
+    ix = np.where(Q == V[..., gym.S], np.arange(gym.n_actions), gym.n_actions)
+    actions = np.minimum.reduceat(ix, gym.a_ptr[:-1], axis=-1)
+
+    return actions, gym.S_prime[gym.o_ptr[actions]]
+
+def choice_probs(Q, gym, choice='softmax', param=1.0):
+    """Probability of choosing each Q-value under a choice rule.
+
+    Parameters
+    ----------
+    Q : array, shape (..., n_actions)
+        Q-values.
+    gym : GraphWorld instance
+        Simulation environment.
+    choice : greedy | softmax
+        Choice rule.
+    param : float
+        Epsilon (greedy) or inverse temperature (softmax).
+
+    Returns
+    -------
+    pi : array, shape (..., n_actions)
+        Choice probabilities (summing to one within each state).
+    """
+    Q = np.asarray(Q, dtype=float)
+
+    if choice == 'greedy':
+        actions, _ = greedy_policy(Q, gym)
+        pi = np.zeros_like(Q)
+        np.put_along_axis(pi, actions, 1 - param, axis=-1)
+        return pi + param / np.diff(gym.a_ptr)[gym.S]
+
+    elif choice == 'softmax':
+        z = Q * param
+        z = np.exp(z - segment_max(z, gym.a_ptr)[..., gym.S])
+        return z / segment_sum(z, gym.a_ptr)[..., gym.S]
+
+    else:
+        raise ValueError('Choice "%s" not valid!' %choice)
+
+def cyclic_states(successors):
+    """Identify states on a cycle of a functional graph (one successor per state)."""
+
+    ## Initialize in-degrees.
+    n = successors.size
+    degree = np.bincount(successors, minlength=n)
+    removed = np.zeros(n, dtype=bool)
+    frontier, = np.where(degree == 0)
+
+    ## Peel off states that cannot be revisited.
+    while frontier.size:
+        removed[frontier] = True
+        degree -= np.bincount(successors[frontier], minlength=n)
+        frontier = np.unique(successors[frontier])
+        frontier = frontier[np.logical_and(degree[frontier] == 0, ~removed[frontier])]
+
+    return ~removed
+
+def greedy_paths(gym, successors, starts=None):
+    """Follow greedy policies from many starting states at once.
+
+    Each path proceeds until it reaches a terminal state, or until its next
+    state has already been visited (i.e. the policy loops).
+
+    Parameters
+    ----------
+    gym : GraphWorld instance
+        Simulation environment.
+    successors : array, shape (..., n_states)
+        Successor of every state (see greedy_policy).
+    starts : array, shape (n_starts,)
+        Starting states. Defaults to all states.
+
+    Returns
+    -------
+    paths : array, shape (..., n_starts, max_length)
+        Ordered visitation of states from each start, padded with -1.
+    """
+    successors = np.asarray(successors)
+    if starts is None: starts = gym.states
+    starts = np.atleast_1d(starts)
+
+    ## Flatten leading dimensions (states of the k-th policy are offset by k * n_states).
+    shape = successors.shape[:-1]
+    offset = np.arange(int(np.prod(shape))) * gym.n_states
+    succ = (successors.reshape(-1, gym.n_states) + offset[:,np.newaxis]).flatten()
+    terminal = np.tile(np.in1d(gym.states, gym.terminal), offset.size)
+    succ[terminal] = np.flatnonzero(terminal)
+
+    ## Identify states on loops.
+    on_cycle = cyclic_states(succ)
+
+    ## Initialize walkers.
+    s = (offset[:,np.newaxis] + starts).flatten()
+    entry = np.where(on_cycle[s], s, -1)
+    active = ~terminal[s]
+    paths = [s]
+
+    ## Main loop.
+    while active.any():
+
+        ## Terminate on loops (i.e. return to the first state on a cycle).
+        s_prime = succ[s]
+        active &= s_prime != entry
+
+        ## Advance walkers.
+        s = np.where(active, s_prime, s)
+        paths.append(np.where(active, s, -1))
+        entry = np.where(np.logical_and(entry < 0, on_cycle[s]), s, entry)
+        active &= ~terminal[s]
+
+    ## Remove offsets.
+    paths = np.column_stack(paths)
+    paths = paths[:, np.any(paths >= 0, axis=0)]
+    paths = np.where(paths < 0, -1, paths % gym.n_states)
+    return paths.reshape(shape + (starts.size, -1))
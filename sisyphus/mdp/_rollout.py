@@ -0,0 +1,85 @@
+"""Monte Carlo rollout module"""
+
+import numpy as np
+from ._backup import segment_table
+from ._td import choose, transition
+
+def rollout(gym, Q, n_episodes, choice='softmax', param=1.0, n_steps=100, start=None):
+    """Simulate episodes of a choice rule over fixed Q-values.
+
+    All episodes are simulated in lockstep: action selection and transitions
+    are computed for all unfinished episodes at once. Transitions are sampled
+    from the outcome probabilities of the environment.
+
+    Parameters
+    ----------
+    gym : GraphWorld instance
+        Simulation environment.
+    Q : array, shape (n_actions,) or (n_episodes, n_actions)
+        Q-values (shared by all episodes, or one row per episode).
+    n_episodes : int
+        Number of episodes.
+    choice : greedy | softmax
+        Choice rule.
+    param : float | array, shape (n_episodes,)
+        Epsilon (greedy) or inverse temperature (softmax).
+    n_steps : int
+        Maximum number of steps allowed in a single episode.
+    start : int | array, shape (n_episodes,)
+        Starting state(s). Defaults to the starting state of the environment.
+
+    Returns
+    -------
+    states : array, shape (n_episodes, n_steps + 1)
+        Visited states, padded with -1.
+    actions : array, shape (n_episodes, n_steps)
+        Chosen Q-values, padded with -1.
+    rewards : array, shape (n_episodes, n_steps)
+        Observed rewards, padded with 0.
+    lengths : array, shape (n_episodes,)
+        Number of steps taken in each episode.
+    """
+
+    ## Error-catching.
+    if not choice in ['greedy', 'softmax']:
+        raise ValueError('Choice "%s" not valid!' %choice)
+    Q = np.broadcast_to(np.asarray(Q, dtype=float), (n_episodes, gym.n_actions))
+    param = np.broadcast_to(np.asarray(param, dtype=float), (n_episodes,))
+
+    ## Precompute padded action / outcome tables.
+    a_table, a_mask = segment_table(gym.a_ptr)
+    o_table, o_mask = segment_table(gym.o_ptr)
+    terminal = np.in1d(gym.states, gym.terminal)
+
+    ## Preallocate space.
+    states = -np.ones((n_episodes, n_steps + 1), dtype=int)
+    actions = -np.ones((n_episodes, n_steps), dtype=int)
+    rewards = np.zeros((n_episodes, n_steps))
+    lengths = np.zeros(n_episodes, dtype=int)
+
+    ## Define starting states.
+    s = np.array(np.broadcast_to(gym.start if start is None else start, (n_episodes,)))
+    states[:,0] = s
+
+    for t in range(n_steps):
+
+        ## Check for termination.
+        ix, = np.where(~terminal[s])
+        if not ix.size: break
+
+        ## Select actions.
+        acts, mask = a_table[s[ix]], a_mask[s[ix]]
+        i = choose(Q[ix[:,np.newaxis], acts], mask, choice, param[ix])
+        a = acts[np.arange(ix.size), i]
+
+        ## Observe next states and rewards.
+        o = transition(gym, a, o_table, o_mask)
+        s[ix] = gym.S_prime[o]
+
+        ## Store.
+        states[ix, t+1] = s[ix]
+        actions[ix, t] = a
+        rewards[ix, t] = gym.rewards[o]
+        lengths[ix] += 1
+
+    return states, actions, rewards, lengths
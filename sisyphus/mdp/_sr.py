@@ -0,0 +1,265 @@
+"""Successor representation module"""
+
+import numpy as np
+from hashlib import sha1
+from scipy.sparse import csr_matrix, identity
+from scipy.sparse.linalg import spsolve, splu, gmres
+from warnings import warn
+from ._policy import choice_probs
+from ._backup import noise_mix
+
+## Maximum number of successor features cached per environment.
+SF_CACHE_SIZE = 8
+
+def _digest(arr):
+    """Cache key of an array (dtype, shape, and digest of its contents)."""
+    arr = np.ascontiguousarray(arr)
+    return arr.dtype.str, arr.shape, sha1(arr.tobytes()).hexdigest()
+
+def policy_matrix(gym, Q, choice='softmax', param=1.0):
+    """State transition matrix and expected rewards under a choice rule.
+
+    Parameters
+    ----------
+    gym : GraphWorld instance
+        Simulation environment.
+    Q : array, shape (n_actions,)
+        Q-values.
+    choice : greedy | softmax
+        Choice rule.
+    param : float
+        Epsilon (greedy) or inverse temperature (softmax).
+
+    Returns
+    -------
+    P : csr_matrix, shape (n_states, n_states)
+        One-step transition probabilities. Rows of terminal states are zero
+        (i.e. episodes end upon entering a terminal state).
+    r : array, shape (n_states,)
+        Expected one-step reward of each state.
+    """
+    B, Sel = outcome_matrices(gym, Q, choice, param)
+    return (B @ Sel).tocsr(), B @ gym.rewards
+
+def outcome_matrices(gym, Q, choice='softmax', param=1.0):
+    """Sparse outcome matrices under a choice rule (see policy_matrix).
+
+    Returns
+    -------
+    B : csr_matrix, shape (n_states, n_outcomes)
+        Joint probability of choosing the Q-value of each outcome and 
+        observing the outcome. Rows of terminal states are zero.
+    Sel : csr_matrix, shape (n_outcomes, n_states)
+        Successor state of each outcome (one-hot).
+    """
+
+    ## Compute joint probability of choice and outcome (random actions with prob. epsilon).
+    pi = choice_probs(Q, gym, choice, param)
+    if gym.epsilon: pi = (1 - gym.epsilon) * pi + gym.epsilon / np.diff(gym.a_ptr)[gym.S]
+    owner = np.repeat(gym.S, np.diff(gym.o_ptr))
+    p = np.repeat(pi, np.diff(gym.o_ptr)) * gym.probs
+    p[np.in1d(owner, gym.terminal)] = 0
+
+    ## Define matrices.
+    n = gym.S_prime.size
+    B = csr_matrix((p, (owner, np.arange(n))), shape=(gym.n_states, n))
+    Sel = csr_matrix((np.ones(n), (np.arange(n), gym.S_prime)), shape=(n, gym.n_states))
+
+    return B, Sel
+
+def successor_representation(gym, Q, choice='softmax', param=1.0, gamma=1.0):
+    """Successor representation under a choice rule.
+
+    Parameters
+    ----------
+    gym : GraphWorld instance
+        Simulation environment.
+    Q : array, shape (n_actions,)
+        Q-values.
+    choice : greedy | softmax
+        Choice rule.
+    param : float
+        Epsilon (greedy) or inverse temperature (softmax).
+    gamma : float
+        Temporal discounting factor.
+
+    Returns
+    -------
+    M : array, shape (n_states, n_states)
+        Expected discounted number of visits to state s' (columns) starting
+        from state s (rows), i.e. M = (I - gamma * P)^-1.
+
+    Notes
+    -----
+    The transition matrix is factorized once (sparse LU) and solved against 
+    all unit vectors. The output is dense; for large environments prefer 
+    occupancy, which solves for a single starting distribution.
+    """
+    P, _ = policy_matrix(gym, Q, choice, param)
+    lu = splu((identity(gym.n_states) - gamma * P).tocsc())
+    return lu.solve(np.eye(gym.n_states))
+
+def occupancy(gym, Q, choice='softmax', param=1.0, gamma=1.0, start=None, method='direct',
+              tol=1e-10):
+    """State occupancy under a choice rule.
+
+    Parameters
+    ----------
+    gym : GraphWorld instance
+        Simulation environment.
+    Q : array, shape (n_actions,)
+        Q-values.
+    choice : greedy | softmax
+        Choice rule.
+    param : float
+        Epsilon (greedy) or inverse temperature (softmax).
+    gamma : float
+        Temporal discounting factor.
+    start : int | array, shape (n_states,)
+        Starting state or distribution over starting states. Defaults to the
+        starting state of the environment.
+    method : direct | iterative
+        Sparse direct (LU) or iterative (GMRES) solver.
+    tol : float
+        Relative tolerance of iterative solver.
+
+    Returns
+    -------
+    d : array, shape (n_states,)
+        Expected discounted number of visits to each state (i.e. one row of 
+        the successor representation). With gamma = 1, the occupancy of 
+        terminal states is the probability of ending the episode there.
+    """
+
+    ## Define starting distribution.
+    if start is None: start = gym.start
+    if np.ndim(start): d0 = np.asarray(start, dtype=float)
+    else: d0 = np.zeros(gym.n_states); d0[start] = 1
+
+    ## Define linear system, i.e. (I - gamma * P)^T d = d0.
+    P, _ = policy_matrix(gym, Q, choice, param)
+    A = (identity(gym.n_states) - gamma * P).T.tocsc()
+
+    ## Solve.
+    if method == 'direct':
+        return spsolve(A, d0)
+
+    elif method == 'iterative':
+        d, info = gmres(A, d0, rtol=tol, atol=0)
+        if info: warn('Iterative solver did not converge.')
+        return d
+
+    else:
+        raise ValueError('Method "%s" not valid!' %method)
+
+def reward_features(gym, states=None):
+    """Reward features indicating the successor state of each outcome.
+
+    Parameters
+    ----------
+    gym : GraphWorld instance
+        Simulation environment.
+    states : array, shape (n_features,)
+        States whose entry is rewarded. Defaults to all states.
+
+    Returns
+    -------
+    features : array, shape (n_outcomes, n_features)
+        Indicator features, such that features @ w assigns reward w[i] to 
+        every transition into states[i]. Transitions out of terminal states
+        are unrewarded.
+    """
+    if states is None: states = gym.states
+    owner = np.repeat(gym.S, np.diff(gym.o_ptr))
+    features = gym.S_prime[:,np.newaxis] == np.asarray(states)
+    features[np.in1d(owner, gym.terminal)] = False
+    return features.astype(float)
+
+class SuccessorFeatures(object):
+    """Successor features of a fixed policy.
+
+    Parameters
+    ----------
+    psi : array, shape (n_states, n_features)
+        Expected discounted sum of reward features from each state.
+    psi_q : array, shape (n_actions, n_features)
+        Expected discounted sum of reward features from each Q-value.
+
+    Notes
+    -----
+    For rewards defined as features @ w, the state values and Q-values of 
+    the policy are psi @ w and psi_q @ w, respectively.
+    """
+
+    def __init__(self, psi, psi_q):
+        self.psi = psi
+        self.psi_q = psi_q
+
+    def __repr__(self):
+        return '<Successor features (n_features=%s)>' %self.psi.shape[-1]
+
+    def values(self, w):
+        """State values under reward weights w, shape (n_features,) or (n_features, n)."""
+        return self.psi @ w
+
+    def q_values(self, w):
+        """Q-values under reward weights w, shape (n_features,) or (n_features, n)."""
+        return self.psi_q @ w
+
+def successor_features(gym, Q, choice='softmax', param=1.0, gamma=1.0, features=None):
+    """Successor features of a fixed policy (cached on the environment).
+
+    Parameters
+    ----------
+    gym : GraphWorld instance
+        Simulation environment.
+    Q : array, shape (n_actions,)
+        Q-values defining the policy.
+    choice : greedy | softmax
+        Choice rule.
+    param : float
+        Epsilon (greedy) or inverse temperature (softmax).
+    gamma : float
+        Temporal discounting factor.
+    features : array, shape (n_outcomes, n_features)
+        Reward features of each outcome (see reward_features). Defaults to 
+        the current rewards of the environment (a single feature).
+
+    Returns
+    -------
+    sf : SuccessorFeatures instance
+        Successor features.
+
+    Notes
+    -----
+    Results are cached on the environment and shared with copies made by
+    GraphWorld.with_rewards, such that evaluating the policy under a new 
+    reward function is a single matrix-vector product. The cache holds the
+    SF_CACHE_SIZE most recently used results (such that sweeps over reward
+    functions with default features do not accumulate entries), and is 
+    cleared whenever the transition structure or probabilities change.
+    """
+    Q = np.asarray(Q, dtype=float)
+    if features is None: features = gym.rewards[:,np.newaxis]
+    features = np.asarray(features, dtype=float)
+
+    ## Check cache (marking hits as most recently used).
+    key = ('sf', _digest(Q), choice, float(param), float(gamma), _digest(features))
+    if key in gym._cache:
+        gym._cache[key] = gym._cache.pop(key)
+        return gym._cache[key]
+
+    ## Solve for state successor features, i.e. (I - gamma * P) psi = B @ features.
+    B, Sel = outcome_matrices(gym, Q, choice, param)
+    A = (identity(gym.n_states) - gamma * (B @ Sel)).tocsc()
+    psi = splu(A).solve(np.asarray(B @ features))
+
+    ## Compute Q-value successor features.
+    C = csr_matrix((gym.probs, (np.repeat(np.arange(gym.n_actions), np.diff(gym.o_ptr)),
+                                np.arange(gym.S_prime.size))), shape=(gym.n_actions, gym.S_prime.size))
+    psi_q = noise_mix((C @ (features + gamma * (Sel @ psi))).T, gym.a_ptr, gym.epsilon).T
+
+    ## Store (evicting least recently used entries).
+    gym._cache[key] = SuccessorFeatures(psi, psi_q)
+    for k in [k for k in gym._cache if k[0] == 'sf'][:-SF_CACHE_SIZE]: del gym._cache[k]
+    return gym._cache[key]
@@ -0,0 +1,160 @@
+"""Parameter sweep module"""
+
+import os, json
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from inspect import signature
+from itertools import product
+from multiprocessing import get_context
+from pandas import DataFrame
+
+def get_params(agent):
+    """Return constructor parameters of an agent."""
+    return {k: getattr(agent, k) for k in signature(type(agent).__init__).parameters if k != 'self'}
+
+def split_params(agent, params):
+    """Split parameters into agent and environment parameters."""
+    agent_params = {k: v for k, v in params.items() if k in get_params(agent)}
+    env_params = {k: v for k, v in params.items() if not k in agent_params}
+    return agent_params, env_params
+
+def _run_job(env, env_params, cls, agent_params, fit_kws, seed):
+    """Run a single sweep job (seeding the global RNG)."""
+
+    ## Seed global RNG stream of job.
+    np.random.seed(seed)
+
+    ## Initialize environment / agent.
+    gym = env(**env_params)
+    agent = cls(**agent_params)
+
+    ## Fit agent.
+    agent = agent.fit(gym, **fit_kws)
+
+    ## Collect results.
+    result = dict(Q=agent.Q, V=agent.V, pi=np.array(agent.pi))
+    if hasattr(agent, 'n_iter'): result['n_iter'] = np.array(agent.n_iter)
+    return result
+
+def run_sweep(env, agent, grid, path=None, n_jobs=1, seed=None, fit_kws=None):
+    """Fit an agent over a grid of agent and environment parameters.
+
+    Parameters
+    ----------
+    env : callable
+        Environment factory, e.g. an environment class. Called with the
+        environment parameters of each job.
+    agent : ValueIteration | ModelFree instance
+        Template agent. Its parameters are overridden by the agent parameters
+        of each job.
+    grid : dict
+        Mapping of parameter names to lists of values. Parameters accepted by
+        the agent's constructor are agent parameters; all others are passed to
+        the environment factory. Jobs are defined by all combinations of values.
+    path : str
+        Directory in which results are written incrementally (one file per job).
+        Jobs with existing results are loaded rather than rerun, such that an
+        interrupted sweep resumes where it stopped. Requires an explicit seed
+        on the first run; later runs reuse the stored seed if none is given.
+    n_jobs : int
+        Number of worker processes.
+    seed : int | SeedSequence
+        Root seed. Each job is assigned an independent RNG stream derived from
+        the root via SeedSequence.spawn.
+    fit_kws : dict
+        Keyword arguments passed to agent.fit.
+
+    Returns
+    -------
+    results : DataFrame
+        One row per job, with columns for each parameter and the fitted
+        Q, V, pi (and n_iter, if reported by the agent).
+
+    Notes
+    -----
+    Results depend only on the job parameters and the root seed, and are
+    therefore identical regardless of the number of workers. Serial sweeps
+    restore the state of the global RNG on return. Workers are
+    started by spawning (rather than forking) fresh interpreters, such that
+    sweeps are safe after solving with multithreaded backends. Parallel 
+    sweeps therefore require an environment factory that is importable by
+    name (e.g. an environment class or module-level function, but not a 
+    lambda or closure), picklable fit_kws, and scripts guarded by 
+    if __name__ == '__main__'.
+    """
+
+    ## Define jobs.
+    keys = list(grid)
+    jobs = [dict(zip(keys, values)) for values in product(*[grid[k] for k in keys])]
+    if fit_kws is None: fit_kws = dict()
+
+    ## Read manifest of existing sweep.
+    stored = None
+    if path is not None:
+        f = os.path.join(path, 'manifest.json')
+        if os.path.isfile(f):
+            with open(f, 'r') as fp: stored = json.load(fp)
+        elif seed is None:
+            raise ValueError('Sweeps written to a path require an explicit seed.')
+
+    ## Define per-job RNG streams (reusing the root seed of an existing sweep).
+    if seed is None and stored is not None:
+        seed = np.random.SeedSequence(int(stored['entropy']), spawn_key=stored['spawn_key'])
+    ss = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    seeds = [int(child.generate_state(1)[0]) for child in ss.spawn(len(jobs))]
+
+    ## Initialize results directory.
+    results = [None] * len(jobs)
+    if path is not None:
+
+        ## Check manifest (prevents resuming with a different sweep).
+        manifest = dict(grid={k: [np.asarray(x).tolist() for x in v] for k, v in grid.items()},
+                        entropy=str(ss.entropy), spawn_key=list(ss.spawn_key))
+        os.makedirs(path, exist_ok=True)
+        if stored is None:
+            with open(f, 'w') as fp: json.dump(manifest, fp)
+        elif stored != manifest:
+            raise ValueError('Sweep at "%s" was run with a different grid or seed.' %path)
+
+        ## Load completed jobs.
+        for i in range(len(jobs)):
+            f = os.path.join(path, 'job_%06d.npz' %i)
+            if os.path.isfile(f):
+                with np.load(f) as npz: results[i] = dict(npz)
+
+    def store(i, result):
+        """Store (and write) result of job i."""
+        results[i] = result
+        if path is not None:
+            f = os.path.join(path, 'job_%06d.npz' %i)
+            np.savez(f + '.tmp.npz', **result)
+            os.replace(f + '.tmp.npz', f)
+
+    def args(i):
+        """Arguments of job i (agents are passed by class and parameters)."""
+        agent_params, env_params = split_params(agent, jobs[i])
+        agent_params = {**get_params(agent), **agent_params}
+        return env, env_params, type(agent), agent_params, fit_kws, seeds[i]
+
+    ## Main loop.
+    todo = [i for i in range(len(jobs)) if results[i] is None]
+    if n_jobs == 1:
+        state = np.random.get_state()
+        try:
+            for i in todo:
+                store(i, _run_job(*args(i)))
+        finally:
+            np.random.set_state(state)
+    elif todo:
+        with ProcessPoolExecutor(max_workers=n_jobs, mp_context=get_context('spawn')) as executor:
+            futures = {executor.submit(_run_job, *args(i)): i for i in todo}
+            for future in as_completed(futures):
+                store(futures[future], future.result())
+
+    ## Convert to DataFrame.
+    data = DataFrame(jobs, columns=keys)
+    for k in results[0]:
+        data[k] = [r[k] if np.ndim(r[k]) else r[k].item() for r in results]
+    data['pi'] = [r['pi'].tolist() for r in results]
+
+    return data
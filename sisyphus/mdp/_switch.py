@@ -0,0 +1,101 @@
+"""Policy switch point module"""
+
+import numpy as np
+from pandas import DataFrame
+from ._policy import greedy_policy
+from ._sweep import get_params, split_params
+
+def switch_points(agent, gym, param, bounds, xtol=1e-4, n_grid=11, criterion='path'):
+    """Locate parameter values at which the greedy policy changes.
+
+    The parameter range is first bracketed on a coarse grid. Every grid
+    interval whose endpoints yield different policies is then bisected until
+    it is narrower than xtol. Intervals whose midpoint differs from both
+    endpoints are split in two, such that several switches within a grid
+    interval are resolved separately.
+
+    Parameters
+    ----------
+    agent : ValueIteration instance
+        Template agent.
+    gym : GraphWorld instance
+        Simulation environment.
+    param : str
+        Name of the parameter to vary. Either an agent parameter (e.g. w,
+        gamma, beta) or an environment parameter (e.g. reward, punishment, p),
+        in which case environments are derived via gym.with_params.
+    bounds : tuple
+        Lower and upper bound of the parameter.
+    xtol : float
+        Width of the returned brackets.
+    n_grid : int
+        Number of points of the initial (bracketing) grid.
+    criterion : path | actions
+        Policies are compared by their greedy path from the starting state
+        (path), or by the greedy action of every state (actions).
+
+    Returns
+    -------
+    switches : DataFrame
+        One row per switch point, with columns for the estimated threshold
+        (midpoint of bracket), the bracket (lower, upper), and the greedy
+        paths on either side (pi_lower, pi_upper). The total number of solves
+        is stored in switches.attrs['n_fits'].
+
+    Notes
+    -----
+    Switches separated by less than the grid spacing are found only if they
+    change the policy at the interval midpoints. Grid solves are warm-started
+    from the solution at the previous grid point, and bisection solves from 
+    the solution at the lower endpoint of their bracket (both endpoints being
+    equidistant from the midpoint).
+    """
+
+    ## Error-catching.
+    if not criterion in ['path', 'actions']:
+        raise ValueError('Criterion "%s" not valid!' %criterion)
+    n_fits = [0]
+
+    def solve(x, Q=None):
+        """Solve at parameter value x, returning (policy key, Q, pi)."""
+        agent_params, env_params = split_params(agent, {param: x})
+        g = gym.with_params(**env_params) if env_params else gym
+        a = type(agent)(**{**get_params(agent), **agent_params})
+        if Q is not None and Q.shape != (g.n_actions,): Q = None
+        a.fit(g, Q=None if Q is None else Q.copy(), verbose=False)
+        n_fits[0] += 1
+        if criterion == 'path': key = tuple(a.pi)
+        else: key = tuple(greedy_policy(a.Q, g)[0])
+        return key, a.Q, a.pi
+
+    ## Bracket switches on coarse grid.
+    grid = np.linspace(bounds[0], bounds[1], n_grid)
+    points, Q = [], None
+    for x in grid:
+        key, Q, pi = solve(x, Q)
+        points.append((x, key, Q, pi))
+    stack = [(points[i], points[i+1]) for i in range(n_grid - 1)[::-1]
+             if points[i][1] != points[i+1][1]]
+
+    ## Bisect brackets.
+    switches = []
+    while stack:
+        lower, upper = stack.pop()
+
+        ## Store narrow brackets.
+        if upper[0] - lower[0] <= xtol:
+            switches.append((lower, upper))
+            continue
+
+        ## Split bracket.
+        x = (lower[0] + upper[0]) / 2
+        key, Q, pi = solve(x, lower[2])
+        mid = (x, key, Q, pi)
+        if key != upper[1]: stack.append((mid, upper))
+        if key != lower[1]: stack.append((lower, mid))
+
+    ## Convert to DataFrame.
+    switches = DataFrame([((l[0] + u[0]) / 2, l[0], u[0], l[3], u[3]) for l, u in switches],
+                         columns=(param, 'lower', 'upper', 'pi_lower', 'pi_upper'))
+    switches.attrs['n_fits'] = n_fits[0]
+    return switches
@@ -2,8 +2,14 @@
 
 import numpy as np
 from copy import deepcopy
+from numba import njit
 from ._misc import check_params, pessimism, categorical
 from ._misc import softmax as _softmax
+from ._policy import greedy_policy, greedy_paths
+from ._backup import POLICIES, learning_rule, segment_max, segment_table, table_values
+
+## Integer codes of choice rules (compiled backend).
+CHOICES = dict(greedy=0, softmax=1)
 
 def epsilon_greedy(arr, epsilon):
     """Epsilon-greedy choice rule."""
@@ -15,6 +21,138 @@ def softmax(arr, beta):
     theta = _softmax(arr * beta)
     return categorical(theta)  
 
+def choose(q, mask, choice, param):
+    """Vectorized choice rule over padded Q-values (one row per agent).
+    
+    Parameters
+    ----------
+    q : array, shape (n, max_size)
+        Padded Q-values (see segment_table).
+    mask : array, shape (n, max_size)
+        True for valid (non-padded) entries.
+    choice : greedy | softmax
+        Choice rule.
+    param : float | array, shape (n,)
+        Epsilon (greedy) or inverse temperature (softmax).
+        
+    Returns
+    -------
+    i : array, shape (n,)
+        Index of chosen action within each row.
+    """
+    u = np.random.random(q.shape[0])
+    
+    if choice == 'greedy':
+        explore = np.random.random(q.shape[0]) < param
+        greedy = np.argmax(np.where(mask, q, -np.inf), axis=-1)
+        return np.where(explore, (u * mask.sum(axis=-1)).astype(int), greedy)
+        
+    elif choice == 'softmax':
+        z = np.where(mask, q * np.reshape(param, (-1,1)), -np.inf)
+        theta = np.exp(z - z.max(axis=-1, keepdims=True)).cumsum(axis=-1)
+        i = (theta < u[:,np.newaxis] * theta[:,-1:]).sum(axis=-1)
+        return np.minimum(i, mask.sum(axis=-1) - 1)
+    
+    else: 
+        raise ValueError('Choice "%s" not valid!' %choice)
+        
+def transition(gym, a, o_table, o_mask):
+    """Vectorized sampling of outcomes for an array of Q-values.
+    
+    Parameters
+    ----------
+    gym : GraphWorld instance
+        Simulation environment.
+    a : array, shape (n,)
+        Indices of chosen Q-values.
+    o_table, o_mask : array, shape (n_actions, max_outcomes)
+        Padded outcome table (see segment_table).
+        
+    Returns
+    -------
+    o : array, shape (n,)
+        Indices of sampled outcomes.
+        
+    Notes
+    -----
+    With epsilon noise, each chosen Q-value is replaced by a uniformly random
+    Q-value of the same state with probability epsilon.
+    """
+    
+    ## Apply epsilon noise.
+    if gym.epsilon:
+        s = gym.S[a]
+        k = gym.a_ptr[s+1] - gym.a_ptr[s]
+        noise = np.random.random(a.size) < gym.epsilon
+        a = np.where(noise, gym.a_ptr[s] + (np.random.random(a.size) * k).astype(int), a)
+    
+    ## Sample outcomes.
+    p = np.where(o_mask[a], gym.probs[o_table[a]], 0).cumsum(axis=-1)
+    j = (p < np.random.random(a.size)[:,np.newaxis] * p[:,-1:]).sum(axis=-1)
+    return o_table[a, np.minimum(j, o_mask[a].sum(axis=-1) - 1)]
+
+@njit(cache=True)
+def _sample(p, u):
+    """Inverse CDF sampling of a categorical distribution."""
+    c = 0.0
+    for i in range(p.size):
+        c += p[i]
+        if u < c: return i
+    return p.size - 1
+
+@njit(cache=True)
+def _train(Q, a_ptr, o_ptr, S_prime, rewards, probs, epsilon, terminal, start, choice, 
+           schedule, n_steps, policy, eta, gamma, beta, w, seed):
+    """Compiled training kernel running a schedule of episodes in place on Q.
+    
+    Returns the flat array of chosen actions and the number of actions per episode.
+    """
+    np.random.seed(seed)
+    
+    ## Preallocate space.
+    actions = np.empty(schedule.size * n_steps, dtype=np.int64)
+    lengths = np.zeros(schedule.size, dtype=np.int64)
+    n = 0
+    
+    for e in range(schedule.size):
+        
+        ## Define starting state.
+        s = start
+        
+        for _ in range(n_steps):
+            
+            ## Check for termination.
+            if terminal[s]: break
+                
+            ## Select action.
+            q = Q[a_ptr[s]:a_ptr[s+1]]
+            if choice == 0:
+                if np.random.random() < 1 - schedule[e]: i = np.argmax(q)
+                else: i = np.random.randint(q.size)
+            else:
+                theta = np.exp(q * schedule[e] - np.max(q * schedule[e]))
+                i = _sample(theta / theta.sum(), np.random.random())
+            a = a_ptr[s] + i
+            actions[n] = a
+            n += 1
+            lengths[e] += 1
+            
+            ## Observe next state and reward (executing a random action with prob. epsilon).
+            b = a
+            if epsilon > 0 and np.random.random() < epsilon:
+                b = a_ptr[s] + np.random.randint(a_ptr[s+1] - a_ptr[s])
+            o = o_ptr[b] + _sample(probs[o_ptr[b]:o_ptr[b+1]], np.random.random())
+            s_prime = S_prime[o]
+            
+            ## Update model.
+            v_prime = learning_rule(Q[a_ptr[s_prime]:a_ptr[s_prime+1]], policy, beta, w)
+            Q[a] += eta * (rewards[o] + gamma * v_prime - Q[a])
+            
+            ## Update state.
+            s = s_prime
+            
+    return actions[:n], lengths
+
 class ModelFree(object):
     '''Q-learning agent.
     
@@ -30,15 +168,17 @@ class ModelFree(object):
         Inverse temperature for future choice (ignored if policy not softmax).
     w : float (default = 1.0)
         Pessimism weight (ignored if policy not pessimism).
-    gamma : float
-      Discount factor.
+    backend : compiled | reference (default = compiled)
+        Implementation of training. The compiled backend runs whole schedules of
+        episodes in a numba kernel. The reference backend runs one episode at a time 
+        in Python and is retained for validation.
 
     References
     ----------
     1. Sutton, R. S., & Barto, A. G. (2018). Reinforcement learning: An introduction. MIT press.
     '''
     
-    def __init__(self, policy='pessimism', eta=0.1, gamma=0.9, beta=10.0, w=1.0):
+    def __init__(self, policy='pessimism', eta=0.1, gamma=0.9, beta=10.0, w=1.0, backend='compiled'):
         
         ## Define choice policy.
         self.policy = policy
@@ -54,6 +194,11 @@ class ModelFree(object):
         self.gamma = gamma
         self.w = w
         check_params(beta=self.beta, eta=self.eta, gamma=self.gamma, w=self.w)       
+        
+        ## Define training implementation.
+        self.backend = backend
+        if not backend in ['compiled', 'reference']: 
+            raise ValueError('Backend "%s" not valid!' %self.backend)
               
     def __repr__(self):
         return '<Model Free Agent>'
@@ -62,11 +207,32 @@ class ModelFree(object):
         """Return copy of agent."""
         return deepcopy(self)
         
+    def _check_schedule(self, choice, schedule):
+        """Define and check schedule of choice rule parameters."""
+        
+        if choice == 'greedy': 
+
+            ## Define schedule.
+            if schedule is None:  schedule = 0.05 * np.ones(100)
+            elif isinstance(schedule, (int, float)): schedule = np.array([schedule])
+            assert np.all(np.logical_and(schedule >= 0, schedule <= 1))
+                
+        elif choice == 'softmax':
+
+            ## Define schedule.
+            if schedule is None: schedule = 10.0 * np.ones(100)
+            elif isinstance(schedule, (int, float)): schedule = np.array([schedule])
+            assert np.all(np.logical_and(schedule >= -50, schedule <= 50))
+            
+        else: 
+            raise ValueError('Choice "%s" not valid!' %choice)
+            
+        return np.asarray(schedule, dtype=float)
+        
     def _run_episode(self, Q, gym, choice, epsilon, n_steps=100):
         """Run single episode of training."""
         
         ## Define starting state.
-        copy = gym.info.copy()
         s = gym.start  
         
         ## Initialize action list.
@@ -78,18 +244,20 @@ class ModelFree(object):
             if s in gym.terminal: break
                 
             ## Select action.
-            copy['Q'] = Q.copy()
-            i = choice(copy.loc[copy.S==s,'Q'].values, epsilon)
-            a = copy[copy.S==s].index[i]
+            i = choice(Q[gym.a_ptr[s]:gym.a_ptr[s+1]], epsilon)
+            a = gym.a_ptr[s] + i
             actions.append(a)
                 
-            ## Observe next state and reward.
-            i = categorical(copy.loc[a,'T'])
-            s_prime = copy.loc[a,"S'"][i]
-            r = copy.loc[a,'R'][i]
+            ## Observe next state and reward (executing a random action with prob. epsilon).
+            b = a
+            if gym.epsilon and np.random.random() < gym.epsilon:
+                b = gym.a_ptr[s] + np.random.randint(gym.a_ptr[s+1] - gym.a_ptr[s])
+            o = gym.o_ptr[b] + categorical(gym.probs[gym.o_ptr[b]:gym.o_ptr[b+1]])
+            s_prime = gym.S_prime[o]
+            r = gym.rewards[o]
 
             ## Update model.
-            v_prime = self._policy(copy.loc[copy.S==s_prime,'Q'])
+            v_prime = self._policy(Q[gym.a_ptr[s_prime]:gym.a_ptr[s_prime+1]])
             delta = r + self.gamma * v_prime - Q[a]
             Q[a] += self.eta * delta
             
@@ -98,43 +266,21 @@ class ModelFree(object):
 
         return Q, actions
     
-    def _v_solve(self, info):
+    def _v_solve(self, gym, Q=None):
         """Compute state value from Q-table."""
-        
-        ## Copy info and append Q-values.
-        copy = info.copy()
-        copy['Q'] = self.Q
+        if Q is None: Q = self.Q
         
         ## Identify max by state.
-        return copy.groupby('S').Q.max().values
+        return segment_max(Q, gym.a_ptr)
         
-    def _pi_solve(self, gym):
+    def _pi_solve(self, gym, Q=None):
         """Compute policy from Q-table."""
+        if Q is None: Q = self.Q
         
-        ## Precompute optimal q(s,a).
-        copy = gym.info.copy()
-        copy['Q'] = self.Q
-        copy = copy.iloc[copy.groupby('S').Q.idxmax().values]
-        copy["S'"] = copy["S'"].apply(lambda arr: arr[0])
-        
-        ## Initialize policy from initial state.
-        policy = [gym.start]
-        
-        ## Iterately append.
-        while True:
-
-            ## Termination check.
-            s = policy[-1]
-            if s in gym.terminal: break
-                
-            ## Observe successor.
-            s_prime, = copy.loc[copy["S"]==s, "S'"].values
-            
-            ## Terminate on loops. Otherwise append.
-            if s_prime in policy: break
-            policy.append(s_prime)
-                
-        return policy
+        ## Follow greedy policy from initial state.
+        _, successors = greedy_policy(Q, gym)
+        path, = greedy_paths(gym, successors, gym.start)
+        return path[path >= 0].tolist()
         
     def fit(self, gym, choice='softmax', schedule=None, n_steps=100, overwrite=False, return_actions=False):
         '''Run a single test episode (i.e. Q-values not updated).
@@ -160,49 +306,133 @@ class ModelFree(object):
         self : returns an instance of self.
         '''   
         
-        ## Define metadata.
-        if choice == 'greedy': 
-
-            ## Define choice rule.
-            choice = epsilon_greedy
-
-            ## Define schedule.
-            if schedule is None:  schedule = 0.05 * np.ones(100)
-            elif isinstance(schedule, (int, float)): schedule = np.array([schedule])
-            assert np.all(np.logical_and(schedule >= 0, schedule <= 1))
-                
-        elif choice == 'softmax':
-
-            ## Define choice rule.
-            choice = softmax
-
-            ## Define schedule.
-            if schedule is None: schedule = 10.0 * np.ones(100)
-            elif isinstance(schedule, (int, float)): schedule = np.array([schedule])
-            assert np.all(np.logical_and(schedule >= -50, schedule <= 50))
-            
-        else: 
-            raise ValueError('Choice "%s" not valid!' %choice)
+        ## Define schedule.
+        schedule = self._check_schedule(choice, schedule)
             
         ## Initialize Q-values.
         if not hasattr(self,'Q') or overwrite: 
-            Q = np.zeros(gym.info.shape[0])
+            Q = np.zeros(gym.n_actions)
         else: 
             Q = self.Q.copy()
             
         ## Solve for Q-values.
-        actions = []
-        for e in schedule: 
-            Q, a = self._run_episode(Q, gym, choice, e, n_steps)
-            actions.append(a)
+        if self.backend == 'compiled':
+            
+            ## Run compiled kernel (seeded from global RNG state).
+            terminal = np.in1d(gym.states, gym.terminal)
+            a, lengths = _train(Q, gym.a_ptr, gym.o_ptr, gym.S_prime, gym.rewards, gym.probs, 
+                                gym.epsilon, terminal, gym.start, CHOICES[choice], schedule, n_steps, 
+                                POLICIES[self.policy], self.eta, self.gamma, self.beta, self.w,
+                                np.random.randint(2**31))
+            actions = [arr.tolist() for arr in np.split(a, np.cumsum(lengths)[:-1])]
+            
+        else:
+            
+            ## Run episodes one at a time.
+            actions = []
+            choice = epsilon_greedy if choice == 'greedy' else softmax
+            for e in schedule: 
+                Q, a = self._run_episode(Q, gym, choice, e, n_steps)
+                actions.append(a)
             
         self.Q = Q
         
         ## Solve for values.
-        self.V = self._v_solve(gym.info)
+        self.V = self._v_solve(gym)
         
         ## Compute policy.
         self.pi = self._pi_solve(gym)
                 
+        if return_actions: return self, actions
+        else: return self
+    
+    def fit_population(self, gym, n_agents, choice='softmax', schedule=None, n_steps=100, 
+                       return_actions=False):
+        '''Train a population of independent agents in lockstep.
+        
+        All agents share the parameters of this agent, but explore and learn 
+        independently. Action selection, transitions and TD updates are computed
+        for all agents at once, with agents that have finished the current 
+        episode masked out.
+        
+        Parameters
+        ----------
+        gym : GraphWorld instance
+            Simulation environment.
+        n_agents : int
+            Number of agents.
+        choice : greedy | softmax
+            Choice rule.
+        schedule : array
+            Parameter value for choice rule (e.g. inverse temperature, epsilon greedy)
+            for a particular trial.
+        n_steps : int
+            Maximum number of steps allowed in a single episode.
+        return_actions : True | False
+            If true, return all choices made during training as an array of shape
+            (n_episodes, n_agents, n_steps), padded with -1.
+            
+        Returns
+        -------
+        self : returns an instance of self.
+        
+        Notes
+        -----
+        Results are stored with a leading agent dimension, i.e. Q has shape 
+        (n_agents, n_actions), V has shape (n_agents, n_states) and pi is a list
+        of greedy policies.
+        '''
+        
+        ## Define schedule.
+        schedule = self._check_schedule(choice, schedule)
+        
+        ## Precompute padded action / outcome tables.
+        a_table, a_mask = segment_table(gym.a_ptr)
+        o_table, o_mask = segment_table(gym.o_ptr)
+        terminal = np.in1d(gym.states, gym.terminal)
+        
+        ## Initialize Q-values.
+        Q = np.zeros((n_agents, gym.n_actions))
+        if return_actions: actions = -np.ones((schedule.size, n_agents, n_steps), dtype=int)
+        
+        for e, param in enumerate(schedule):
+            
+            ## Define starting states.
+            s = np.repeat(gym.start, n_agents)
+            
+            for t in range(n_steps):
+                
+                ## Check for termination.
+                ix, = np.where(~terminal[s])
+                if not ix.size: break
+                    
+                ## Select actions.
+                acts, mask = a_table[s[ix]], a_mask[s[ix]]
+                i = choose(Q[ix[:,np.newaxis], acts], mask, choice, param)
+                a = acts[np.arange(ix.size), i]
+                if return_actions: actions[e, ix, t] = a
+                    
+                ## Observe next states and rewards.
+                o = transition(gym, a, o_table, o_mask)
+                s_prime = gym.S_prime[o]
+                
+                ## Update model.
+                acts, mask = a_table[s_prime], a_mask[s_prime]
+                v_prime = table_values(Q[ix[:,np.newaxis], acts], mask, self.policy, 
+                                       beta=self.beta, w=self.w)
+                Q[ix, a] += self.eta * (gym.rewards[o] + self.gamma * v_prime - Q[ix, a])
+                
+                ## Update states.
+                s[ix] = s_prime
+                
+        self.Q = Q
+        
+        ## Solve for values.
+        self.V = self._v_solve(gym)
+        
+        ## Compute policies.
+        _, successors = greedy_policy(Q, gym)
+        self.pi = [path[path >= 0].tolist() for path in greedy_paths(gym, successors, gym.start)[:,0]]
+        
         if return_actions: return self, actions
         else: return self
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""Tree search module"""
+
+import numpy as np
+from heapq import heappush, heappop
+from numba import njit
+from ._misc import check_params
+from ._backup import noise_mix, table_values
+
+@njit(cache=True)
+def _search(rewards, branching, n_internal, gamma, threshold, p_prune, budget, best_first, seed):
+    """Compiled search kernel over a heap-ordered tree.
+
+    Nodes are expanded depth-first (stack) or best-first (heap ordered by the
+    discounted return of the path to each node) until the budget is spent.
+    Children entered through a reward at or below threshold are pruned (i.e.
+    never expanded) with probability p_prune. Returns the expanded nodes (in
+    order of expansion) and the number of pruned children.
+    """
+    np.random.seed(seed)
+
+    ## Initialize frontier with root (negated return, node, discount).
+    frontier = [(0.0, 0, 1.0)]
+    expanded = np.empty(min(budget, n_internal), dtype=np.int64)
+    n, n_pruned = 0, 0
+
+    while len(frontier) and n < expanded.size:
+
+        ## Pop next node.
+        if best_first: g, s, discount = heappop(frontier)
+        else: g, s, discount = frontier.pop()
+        expanded[n] = s
+        n += 1
+
+        ## Generate children (in reverse, such that the first child is searched first).
+        for j in range(branching - 1, -1, -1):
+            c = branching * s + 1 + j
+            if c >= n_internal: continue
+
+            ## Prune below large losses.
+            if rewards[c-1] <= threshold and np.random.random() < p_prune:
+                n_pruned += 1
+                continue
+
+            ## Push child.
+            child = (g - discount * rewards[c-1], c, discount * gamma)
+            if best_first: heappush(frontier, child)
+            else: frontier.append(child)
+
+    return expanded[:n], n_pruned
+
+class TreeSearch(object):
+    """Budgeted tree search with Pavlovian pruning.
+
+    Parameters
+    ----------
+    policy : max | min | softmax | pessimism (default = max)
+        Learning rule.
+    gamma : float (default = 1.0)
+        Temporal discounting factor.
+    beta : float (default = 10.0)
+        Inverse temperature for future choice (ignored if policy not softmax).
+    w : float (default = 1.0)
+        Pessimism weight (ignored if policy not pessimism).
+    threshold : float (default = -50)
+        Rewards at or below threshold are large losses.
+    p_prune : float (default = 0.0)
+        Probability of pruning (i.e. not searching) the subtree below a large loss.
+    budget : int (default = None)
+        Maximum number of nodes expanded. If None, the search is exhaustive.
+    order : depth | best (default = depth)
+        Search order. Depth-first search expands the most recently generated
+        node; best-first search expands the node with the largest discounted
+        return from the root.
+
+    Notes
+    -----
+    Expanding a node evaluates the rewards of its children. Unexpanded nodes
+    (pruned, beyond budget, or leaves) are valued at zero, such that the
+    Q-value of entering them is their one-step reward. Without pruning and
+    budget, the solution is exact.
+
+    References
+    ----------
+    1. Huys, Q. J., Eshel, N., O'Nions, E., Sheridan, L., Dayan, P., & Roiser, J. P. (2012).
+       Bonsai trees in your head: how the Pavlovian system sculpts goal-directed choices by
+       pruning decision trees. PLoS computational biology, 8(3), e1002410.
+    """
+
+    def __init__(self, policy='max', gamma=1.0, beta=10.0, w=1.0, threshold=-50, p_prune=0.0,
+                 budget=None, order='depth'):
+
+        ## Define choice policy.
+        self.policy = policy
+        if not policy in ['max', 'min', 'softmax', 'pessimism']:
+            raise ValueError('Policy "%s" not valid!' %self.policy)
+
+        ## Check parameters.
+        self.gamma = gamma
+        self.beta = beta
+        self.w = w
+        check_params(gamma=self.gamma, beta=self.beta, w=self.w)
+
+        ## Define pruning.
+        self.threshold = threshold
+        self.p_prune = p_prune
+        if p_prune < 0 or p_prune > 1:
+            raise ValueError('Parameter "p_prune" must be in range [0,1].')
+
+        ## Define search.
+        self.budget = budget
+        self.order = order
+        if not order in ['depth', 'best']:
+            raise ValueError('Order "%s" not valid!' %self.order)
+
+    def __repr__(self):
+        return '<Tree search>'
+
+    def fit(self, gym):
+        """Search decision tree.
+
+        Parameters
+        ----------
+        gym : DecisionTree instance
+            Simulation environment (heap-ordered tree).
+
+        Returns
+        -------
+        self : returns an instance of self.
+
+        Notes
+        -----
+        Q-values and state values of nodes not expanded are NaN. The expanded
+        nodes (in order of expansion), their number and the number of pruned
+        branches are stored as nodes, n_expanded and n_pruned, respectively.
+        """
+
+        ## Error-catching.
+        if not hasattr(gym, 'branching') or gym.o_ptr[-1] != gym.n_actions:
+            raise ValueError('Tree search requires a heap-ordered decision tree.')
+        b = gym.branching
+        n_internal = gym.terminal[0]
+        budget = n_internal if self.budget is None else self.budget
+
+        ## Search tree.
+        self.nodes, self.n_pruned = _search(gym.rewards, b, n_internal, self.gamma,
+                                            self.threshold, self.p_prune, budget,
+                                            self.order == 'best', np.random.randint(2**31))
+        self.n_expanded = self.nodes.size
+
+        ## Initialize values.
+        self.Q = np.full(gym.n_actions, np.nan)
+        self.V = np.full(gym.n_states, np.nan)
+        V = np.zeros(gym.n_states)
+
+        ## Back up values over expanded nodes (deepest level first).
+        depth = np.searchsorted((b ** np.arange(gym.depth + 1) - 1) // (b - 1), self.nodes,
+                                side='right') - 1
+        for d in np.unique(depth)[::-1]:
+            nodes = self.nodes[depth == d]
+            a = (b * nodes[:,np.newaxis] + np.arange(b)).flatten()
+            q = noise_mix((gym.rewards[a] + self.gamma * V[a + 1]).reshape(-1, b),
+                          np.array([0, b]), gym.epsilon)
+            self.Q[a] = q.flatten()
+            self.V[nodes] = V[nodes] = table_values(q, np.ones_like(q, dtype=bool), self.policy,
+                                                    beta=self.beta, w=self.w)
+
+        ## Follow greedy policy over expanded nodes.
+        self.pi = [0]
+        while not np.isnan(self.V[self.pi[-1]]):
+            a = b * self.pi[-1] + np.arange(b)
+            self.pi.append(int(a[np.argmax(self.Q[a])]) + 1)
+
+        return self
@@ -1,6 +1,9 @@
+import pytest
 import numpy as np
 from sisyphus.mdp import ValueIteration
-from sisyphus.envs._base import GraphWorld
+from sisyphus.mdp._backup import POLICIES, parallel_jacobi, partition_states
+from sisyphus.envs import OpenField, Helplessness, DecisionTree
+from sisyphus.envs._base import GraphWorld, grid_to_adj
 from sisyphus.tests.common import test_world
 
 def test_value_iteration():
@@ -29,3 +32,251 @@ def test_value_iteration():
     assert np.array_equal(qvi.Q, [ 0.0,  1. , -1. ,  0. ,  0. ])
     assert np.array_equal(qvi.V, [ 0.0,  1. ,  0. ,  0. ])
     assert np.array_equal(qvi.pi, np.arange(3))
+
+def test_backends():
+    "Test vectorized and reference Bellman backups agree."
+
+    ## Generate test gym.
+    gym = OpenField()
+
+    ## Iterate over learning rules.
+    for policy in ['max', 'min', 'softmax', 'pessimism']:
+        
+        ## Solve for Q-values.
+        ref = ValueIteration(policy=policy, gamma=0.95, beta=2.0, w=0.5, max_iter=10, 
+                             backend='reference').fit(gym, verbose=False)
+        vec = ValueIteration(policy=policy, gamma=0.95, beta=2.0, w=0.5, max_iter=10, 
+                             backend='vectorized').fit(gym, verbose=False)
+        
+        assert np.allclose(ref.Q, vec.Q, atol=1e-12, rtol=0)
+        assert np.allclose(ref.V, vec.V, atol=1e-12, rtol=0)
+        assert np.array_equal(ref.pi, vec.pi)
+        assert np.equal(ref.n_iter, vec.n_iter)
+
+def test_parallel():
+    "Test parallel Jacobi sweeps against vectorized backups."
+
+    gym = OpenField(shape=(15,12), epsilon=0.1)
+    for policy in ['max', 'softmax', 'pessimism']:
+        kwargs = dict(policy=policy, gamma=0.95, beta=2.0, w=0.5, tol=1e-8, max_iter=1000)
+        ref = ValueIteration(**kwargs).fit(gym)
+        qvi = ValueIteration(backend='parallel', **kwargs).fit(gym)
+        assert np.allclose(ref.Q, qvi.Q, atol=1e-12, rtol=0)
+        assert np.equal(ref.n_iter, qvi.n_iter)
+
+        ## Partition states into blocks (independent of number of threads).
+        for n_parts in [1, 7, gym.n_states + 5]:
+            bounds = partition_states(gym.a_ptr, n_parts)
+            assert bounds[0] == 0 and bounds[-1] == gym.n_states
+            Q = np.zeros(gym.n_actions)
+            n_iter = parallel_jacobi(Q, gym.a_ptr, gym.o_ptr, gym.S_prime, gym.rewards, gym.probs,
+                                     gym.epsilon, POLICIES[policy], 0.95, 2.0, 0.5, 1e-8, 1000, 
+                                     bounds)
+            assert np.allclose(ref.Q, Q, atol=1e-12, rtol=0)
+            assert np.equal(ref.n_iter, n_iter)
+
+    ## Blocks cover all states (including states without Q-values).
+    for n_parts in [1, 2, 5]:
+        bounds = partition_states(np.array([0, 2, 4, 4, 4]), n_parts)
+        assert bounds[0] == 0 and bounds[-1] == 4
+        assert np.all(np.diff(bounds) > 0)
+
+def test_fit_many():
+    "Test batched parameter-sweep solver."
+
+    ## Generate test gym.
+    gym = OpenField()
+    
+    ## Solve all settings at once.
+    weights, gammas = [1.0, 0.5, 0.0], [0.9, 0.95]
+    qvi = ValueIteration(policy='pessimism').fit_many(gym, w=weights, gamma=gammas, verbose=False)
+    assert np.array_equal(qvi.Q.shape, [6, gym.n_actions])
+    assert np.array_equal(qvi.V.shape, [6, gym.n_states])
+    
+    ## Compare against individual solutions.
+    for i, row in qvi.settings.iterrows():
+        ref = ValueIteration(policy='pessimism', w=row.w, gamma=row.gamma).fit(gym, verbose=False)
+        assert np.array_equal(ref.Q, qvi.Q[i])
+        assert np.array_equal(ref.V, qvi.V[i])
+        assert np.equal(ref.n_iter, qvi.n_iter[i])
+
+def test_methods():
+    "Test Gauss-Seidel and prioritized sweeping updates."
+
+    ## Generate test gym.
+    gym = OpenField()
+    
+    ## Solve with synchronous updates.
+    ref = ValueIteration(policy='pessimism', gamma=0.95, w=0.5, tol=1e-8, max_iter=1000).fit(gym)
+    
+    ## Iterate over update schemes.
+    for method in ['gauss-seidel', 'prioritized']:
+        qvi = ValueIteration(policy='pessimism', gamma=0.95, w=0.5, tol=1e-8, max_iter=1000, 
+                             method=method).fit(gym)
+        assert np.allclose(ref.Q, qvi.Q, atol=1e-6, rtol=0)
+        assert qvi.n_backups < ref.n_backups
+
+def test_backward_induction():
+    "Test backward induction in acyclic environments."
+
+    ## Generate test gyms.
+    gym = GraphWorld(*test_world())
+    tree = DecisionTree()
+    
+    ## Test exact solution.
+    qvi = ValueIteration(policy='pessimism', gamma=0.9, w=0.5, method='backward').fit(gym)
+    assert np.array_equal(qvi.Q, [ 0.0,  1. , -1. ,  0. ,  0. ])
+    assert np.array_equal(qvi.pi, np.arange(3))
+    assert np.equal(qvi.n_iter, 1)
+    
+    ## Compare against synchronous updates.
+    for policy in ['max', 'min', 'softmax', 'pessimism']:
+        ref = ValueIteration(policy=policy, gamma=1.0, beta=0.1, w=0.5).fit(tree)
+        qvi = ValueIteration(policy=policy, gamma=1.0, beta=0.1, w=0.5, method='auto').fit(tree)
+        assert np.allclose(ref.Q, qvi.Q, atol=1e-12, rtol=0)
+        
+    ## Test cyclic environments.
+    with pytest.raises(ValueError):
+        ValueIteration(method='backward').fit(OpenField())
+
+def test_tree():
+    "Test level-by-level solution of heap-ordered decision trees."
+
+    ## Generate test gyms.
+    np.random.seed(0)
+    draw = lambda n: np.random.normal(0, 10, n)
+    trees = [DecisionTree(), DecisionTree(depth=5, branching=3, rewards=draw),
+             DecisionTree().with_params(rewards=draw)]
+    
+    ## Compare against backward induction.
+    for tree in trees:
+        for policy in ['max', 'min', 'softmax', 'pessimism']:
+            ref = ValueIteration(policy=policy, gamma=0.95, beta=0.5, w=0.5, method='backward')
+            qvi = ValueIteration(policy=policy, gamma=0.95, beta=0.5, w=0.5, method='tree')
+            assert np.allclose(ref.fit(tree).Q, qvi.fit(tree).Q, atol=1e-12, rtol=0)
+            
+    ## Test other environments.
+    with pytest.raises(ValueError):
+        ValueIteration(method='tree').fit(OpenField())
+
+def test_scc():
+    "Test blockwise value iteration over strongly connected components."
+
+    ## Generate composite gym (chain of rooms joined by one-way doors).
+    n_rooms, n = 4, 16
+    T = np.ones((n_rooms * n + 1, n_rooms * n + 1)) * np.nan
+    for k in range(n_rooms):
+        T[k*n:(k+1)*n, k*n:(k+1)*n] = grid_to_adj(np.zeros((4,4)))
+        T[(k+1)*n-1, (k+1)*n] = 1
+    T[-1,-1] = 1
+    R = np.where(np.isnan(T), np.nan, 0)
+    R[-2,-1] = 10
+    gym = GraphWorld(T, R, 0, [n_rooms * n])
+    
+    ## Compare against synchronous updates.
+    for policy in ['max', 'softmax', 'pessimism']:
+        ref = ValueIteration(policy=policy, gamma=0.95, beta=1.0, w=0.5, tol=1e-8, 
+                             max_iter=1000).fit(gym)
+        qvi = ValueIteration(policy=policy, gamma=0.95, beta=1.0, w=0.5, tol=1e-8, 
+                             max_iter=1000, method='scc').fit(gym)
+        assert np.allclose(ref.Q, qvi.Q, atol=1e-5, rtol=0)
+        assert qvi.n_backups < ref.n_backups
+
+def test_fit_continuation():
+    "Test warm-started continuation sweeps."
+
+    ## Solve along path of pessimism weights.
+    gym = OpenField()
+    ws = np.linspace(0, 1, 21)
+    qvi = ValueIteration(policy='pessimism', gamma=0.95, tol=1e-8, max_iter=1000)
+    qvi = qvi.fit_continuation(gym, 'w', ws)
+    assert np.equal(qvi.w, 1.0)
+    assert np.array_equal(qvi.settings.w, ws)
+
+    ## Compare against independent solves.
+    n_iter = 0
+    for i, w in enumerate(ws):
+        ref = ValueIteration(policy='pessimism', gamma=0.95, w=w, tol=1e-8, max_iter=1000).fit(gym)
+        assert np.allclose(ref.Q, qvi.Q[i], atol=1e-6)
+        n_iter += ref.n_iter
+    assert qvi.n_iter.sum() < n_iter
+
+    ## Test repeated parameter values.
+    ws = [0.2, 0.5, 0.5, 0.8]
+    qvi = ValueIteration(policy='pessimism', gamma=0.95, tol=1e-8, max_iter=1000)
+    qvi = qvi.fit_continuation(gym, 'w', ws)
+    assert np.allclose(qvi.Q[1], qvi.Q[2], atol=1e-6)
+    for i, w in enumerate(ws):
+        ref = ValueIteration(policy='pessimism', gamma=0.95, w=w, tol=1e-8, max_iter=1000).fit(gym)
+        assert np.allclose(ref.Q, qvi.Q[i], atol=1e-6)
+
+def test_sensitivities():
+    "Test implicit differentiation against finite differences."
+
+    gym, h = OpenField(), 1e-5
+    for policy, params in [('pessimism', ['w', 'gamma']), ('softmax', ['beta', 'gamma'])]:
+        kwargs = dict(policy=policy, gamma=0.9, beta=2.0, w=0.6, tol=1e-12, max_iter=10000)
+        qvi = ValueIteration(**kwargs).fit(gym).sensitivities(gym, params)
+
+        ## Compare against central differences.
+        for k in params:
+            hi = ValueIteration(**{**kwargs, k: kwargs[k] + h}).fit(gym)
+            lo = ValueIteration(**{**kwargs, k: kwargs[k] - h}).fit(gym)
+            assert np.allclose(qvi.dQ[k], (hi.Q - lo.Q) / (2 * h), atol=1e-5)
+            assert np.allclose(qvi.dV[k], (hi.V - lo.V) / (2 * h), atol=1e-5)
+
+    ## Check invalid parameter.
+    with pytest.raises(ValueError):
+        qvi.sensitivities(gym, ['epsilon'])
+
+def test_epsilon_noise():
+    "Test implicit epsilon noise against explicit outcome buffers."
+
+    ## Materialize noisy outcomes.
+    gym = OpenField(shape=(5,6), epsilon=0.2)
+    S_prime, rewards, probs, o_ptr = gym._noisy_outcomes()
+    ref = gym.with_params(epsilon=0)
+    ref._set_dynamics(gym.S, gym.a_ptr, o_ptr, S_prime, rewards, probs)
+    assert gym.S_prime.size < ref.S_prime.size
+    
+    ## Compare update schemes.
+    for policy in ['max', 'softmax', 'pessimism']:
+        kwargs = dict(policy=policy, gamma=0.95, beta=2.0, w=0.6, tol=1e-10, max_iter=5000)
+        Q = ValueIteration(**kwargs).fit(ref).Q
+        for method in ['jacobi', 'gauss-seidel', 'prioritized', 'scc']:
+            qvi = ValueIteration(method=method, **kwargs).fit(gym)
+            assert np.allclose(qvi.Q, Q, atol=1e-6)
+
+def test_multigrid():
+    "Test multigrid value iteration against synchronous sweeps."
+
+    n_cycles = dict()
+    for shape in [(21,21), (61,61)]:
+        gym = OpenField(shape=shape)
+        for policy in ['max', 'pessimism']:
+            kwargs = dict(policy=policy, gamma=0.99, w=0.5, tol=1e-8, max_iter=10000)
+            ref = ValueIteration(**kwargs).fit(gym)
+            qvi = ValueIteration(method='multigrid', **kwargs).fit(gym)
+            assert np.allclose(qvi.Q, ref.Q, atol=1e-5)
+            assert np.equal(qvi.n_iter, np.ceil(qvi.n_backups / gym.n_actions))
+            n_cycles[shape, policy] = qvi.n_cycles
+
+        ## Equivalent number of sweeps is smaller on large grids.
+        if shape == (61,61): assert qvi.n_iter < ref.n_iter
+
+    ## Number of cycles is independent of grid size.
+    assert np.equal(n_cycles[(21,21), 'max'], n_cycles[(61,61), 'max'])
+
+    ## Test grids with nonviable or permuted tiles.
+    kwargs = dict(policy='max', gamma=0.95, tol=1e-8, max_iter=10000)
+    for gym in [Helplessness(), OpenField(shape=(9,9))]:
+        gym.grid = gym.grid[::-1]
+        ref = ValueIteration(**kwargs).fit(gym)
+        assert np.allclose(ValueIteration(method='multigrid', **kwargs).fit(gym).Q, ref.Q)
+
+    ## Check invalid environments.
+    with pytest.raises(ValueError):
+        ValueIteration(method='multigrid').fit(DecisionTree())
+    gym.grid = gym.grid + 0.5
+    with pytest.raises(ValueError):
+        ValueIteration(method='multigrid').fit(gym)
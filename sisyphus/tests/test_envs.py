@@ -1,5 +1,7 @@
+import pytest
 import numpy as np
-from sisyphus.envs._base import GraphWorld
+from sisyphus.envs import OpenField, CliffWalking, Helplessness
+from sisyphus.envs._base import GraphWorld, grid_to_adj, grid_to_edges
 from sisyphus.tests.common import test_world
 
 def test_graph_world():
@@ -17,6 +19,168 @@ def test_graph_world():
     ## Tests of info.
     assert np.array_equal(gym.info.shape, [5,4])
     assert np.array_equal(gym.info["S"].values,           [0, 1, 1, 2, 3])
+    assert np.array_equal(np.concatenate(gym.info["S'"]), [1, 2, 3, 2, 3])
+    assert np.array_equal(np.concatenate(gym.info["R"]),  [0, 1,-1, 0, 0])
+    assert np.array_equal(np.concatenate(gym.info["T"]),  [1, 1, 1, 1, 1])
+
+    ## Tests of compact buffers.
+    assert np.equal(gym.n_actions, 5)
+    assert np.array_equal(gym.S,       [0, 1, 1, 2, 3])
+    assert np.array_equal(gym.a_ptr,   [0, 1, 3, 4, 5])
+    assert np.array_equal(gym.o_ptr,   [0, 1, 2, 3, 4, 5])
+    assert np.array_equal(gym.S_prime, [1, 2, 3, 2, 3])
+
+    ## Tests of epsilon noise (implicit in buffers, explicit in info).
+    T, R, start, terminal = test_world()
+    gym = GraphWorld(T, R, start, terminal, epsilon=0.2)
+    assert np.array_equal(gym.o_ptr,   [0, 1, 2, 3, 4, 5])
     assert np.array_equal(np.concatenate(gym.info["S'"]), [1, 2, 3, 3, 2, 2, 3])
     assert np.array_equal(np.concatenate(gym.info["R"]),  [0, 1,-1,-1, 1, 0, 0])
-    assert np.array_equal(np.concatenate(gym.info["T"]),  [1, 1, 0, 1, 0, 1, 1])
+    assert np.allclose(np.concatenate(gym.info["T"]),     [1, 0.9, 0.1, 0.9, 0.1, 1, 1])
+
+def test_action_order():
+    """Test Q-values of grid worlds keep the roll order of the original layout."""
+    from sisyphus.mdp import ValueIteration
+
+    ## Reference greedy paths (max, pessimism).
+    paths = {
+        OpenField: ([115, 104, 93, 82, 71, 60, 49, 38, 27, 16, 15, 14, 13],
+                    [115, 114, 113, 112, 101, 90, 79, 68, 57, 46, 35, 24, 13]),
+        CliffWalking: ([120, 108, 109, 110, 111, 112, 113, 114, 115, 116, 117, 118, 119, 131],
+                       [120, 108, 96, 84, 72, 60, 48, 36, 24, 12, 0, 1]),
+        Helplessness: ([44, 29, 28, 27, 26, 25, 24, 23, 22, 21, 36, 35, 34, 33, 32, 31, 30],
+                       [44, 45]),
+    }
+
+    for env, (pi_max, pi_pessimism) in paths.items():
+        gym = env()
+
+        ## Outcomes of the j-th Q-value are the successors of its state rolled by j.
+        noisy = GraphWorld.from_edges(gym.S, gym.S_prime, gym.rewards, gym.start, gym.terminal,
+                                      gym.n_states, epsilon=0.1)
+        for s in gym.states:
+            successors = np.sort(gym.S_prime[gym.a_ptr[s]:gym.a_ptr[s+1]])
+            rows = noisy.info[noisy.info["S"] == s]["S'"]
+            for j, row in enumerate(rows):
+                assert np.array_equal(row, np.roll(successors, j))
+                assert np.equal(gym.S_prime[gym.a_ptr[s] + j], row[0])
+
+        ## Test greedy paths (tie-breaking depends on action order).
+        assert np.array_equal(ValueIteration(policy='max').fit(gym).pi, pi_max)
+        assert np.array_equal(ValueIteration(policy='pessimism', w=0.5).fit(gym).pi, pi_pessimism)
+
+    ## Test example state.
+    gym = CliffWalking()
+    assert np.array_equal(gym.S_prime[gym.a_ptr[60]:gym.a_ptr[61]], [48, 72, 61])
+
+def test_grid_to_edges():
+    """Test sparse grid world construction."""
+
+    ## Generate grid with nonviable tiles.
+    grid = np.zeros((4,5))
+    grid[[0,2],[1,3]] = np.nan
+
+    ## Compare against adjacency matrix.
+    T = grid_to_adj(grid, [0, 5])
+    S, S_prime = grid_to_edges(grid, [0, 5])
+    assert np.array_equal(np.column_stack([S, S_prime]), np.argwhere(~np.isnan(T)))
+
+    ## Tests of diagonal neighbors.
+    S, S_prime = grid_to_edges(np.zeros((3,3)), diagonal=True)
+    assert np.array_equal(np.bincount(S), [3, 5, 3, 5, 8, 5, 3, 5, 3])
+    assert np.array_equal(S_prime[S == 0], [1, 3, 4])
+
+    ## Tests of resized environments.
+    for env in [OpenField, CliffWalking, Helplessness]:
+        gym = env(shape=(25,31))
+        ix = np.in1d(gym.S, gym.terminal)
+        assert np.array_equal(gym.S_prime[gym.o_ptr[:-1]][ix], gym.S[ix])
+        assert gym.start in gym.viable_states
+
+def test_sparse_graph_world():
+    """Test GraphWorld initialization from sparse matrices and edge lists."""
+    from scipy.sparse import coo_matrix
+
+    ## Generate test gym.
+    T, R, start, terminal = test_world()
+    gym = GraphWorld(T, R, start, terminal)
+
+    ## Define (shuffled) edge list.
+    S, S_prime = np.where(~np.isnan(T))
+    ix = np.random.permutation(S.size)
+    S, S_prime, rewards = S[ix], S_prime[ix], R[S[ix], S_prime[ix]]
+
+    ## Compare compact buffers.
+    for other in [GraphWorld(coo_matrix((T[S, S_prime], (S, S_prime)), T.shape),
+                             coo_matrix((rewards, (S, S_prime)), T.shape), start, terminal),
+                  GraphWorld.from_edges(S, S_prime, rewards, start, terminal)]:
+        for k in ['S', 'a_ptr', 'o_ptr', 'S_prime', 'rewards', 'probs']:
+            assert np.array_equal(getattr(gym, k), getattr(other, k))
+
+    ## Check states without outgoing edges (interior / last state).
+    for drop in [1, 3]:
+        keep = S != drop
+        with pytest.raises(ValueError):
+            GraphWorld.from_edges(S[keep], S_prime[keep], rewards[keep], start, terminal, 
+                                  n_states=4)
+        T_drop = T.copy()
+        T_drop[drop] = np.nan
+        with pytest.raises(ValueError):
+            GraphWorld(T_drop, R, start, terminal)
+
+def test_family():
+    """Test construction of environment families."""
+    from sisyphus.envs import BART, SleepingPredator
+
+    ## Compare against individual construction.
+    gyms = BART.family(pumps=12, mu=[4,6,8], sd=[1,2])
+    assert len(gyms) == 6
+    for gym, (mu, sd) in zip(gyms, [(mu, sd) for mu in [4,6,8] for sd in [1,2]]):
+        assert np.array_equal(gym.probs, BART(pumps=12, mu=mu, sd=sd).probs)
+        assert gym.S_prime is gyms[0].S_prime
+
+    gyms = SleepingPredator.family(p=[0.1, 0.3])
+    for gym, p in zip(gyms, [0.1, 0.3]):
+        assert np.array_equal(gym.probs, SleepingPredator(p=p).probs)
+
+def test_with_params():
+    """Test copy-on-write environment re-parameterization."""
+    from sisyphus.envs import BART, FreeChoice
+
+    for env, params in [(OpenField, dict(reward=3, punishment=-1)), (BART, dict(mu=7, sd=2)),
+                        (FreeChoice, dict(rewards=[2,3], probs=[0.2,0.8])), (BART, dict(pumps=12))]:
+
+        ## Compare against full construction.
+        gym = env()
+        other = gym.with_params(**params)
+        for k in ['S', 'a_ptr', 'o_ptr', 'S_prime', 'rewards', 'probs']:
+            assert np.array_equal(getattr(other, k), getattr(env(**params), k))
+            assert np.array_equal(getattr(gym, k), getattr(env(), k))
+
+        ## Transition structure is shared unless changed.
+        assert (other.S_prime is gym.S_prime) == (not 'pumps' in params)
+
+def test_decision_tree():
+    """Test heap-ordered decision tree generator."""
+    from scipy.stats import norm
+    from sisyphus.envs import DecisionTree
+
+    ## Test default tree (Huys et al., 2012).
+    gym = DecisionTree()
+    assert np.equal(gym.n_states, 15)
+    assert np.array_equal(gym.terminal, np.arange(7,15))
+    assert np.array_equal(gym.rewards[:2], [-70, -20])
+
+    ## Test heap layout.
+    gym = DecisionTree(depth=4, branching=3, rewards=norm(0, 10))
+    assert np.equal(gym.n_states, 121)
+    assert np.array_equal(gym.level(1), [1, 2, 3])
+    assert np.array_equal(gym.terminal, gym.level(4))
+    ix = np.flatnonzero(~np.in1d(gym.S, gym.terminal))
+    assert np.array_equal(gym.S_prime[ix], ix + 1)
+    assert np.array_equal(gym.S[ix], ix // 3)
+    assert np.array_equal(gym.rewards[ix], gym.node_rewards[1:])
+
+    ## Test reward arrays.
+    rewards = np.arange(120)
+    assert np.array_equal(gym.with_params(rewards=rewards).node_rewards[1:], rewards)
@@ -0,0 +1,42 @@
+import numpy as np
+from sisyphus.envs import OpenField
+from sisyphus.mdp import ValueIteration, greedy_policy, greedy_paths
+
+def test_greedy_policy():
+    """Test vectorized greedy policy extraction."""
+
+    ## Solve gym.
+    gym = OpenField()
+    qvi = ValueIteration(policy='max', gamma=0.95).fit(gym, verbose=False)
+    actions, successors = greedy_policy(qvi.Q, gym)
+
+    ## Tests of policy table.
+    assert np.array_equal(gym.S[actions], gym.states)
+    assert np.array_equal(qvi.Q[actions], qvi.V)
+    assert np.array_equal(successors[qvi.pi[:-1]], qvi.pi[1:])
+
+    ## Tests of paths (from all states).
+    paths = greedy_paths(gym, successors)
+    assert np.equal(paths.shape[0], gym.n_states)
+    assert np.array_equal(paths[gym.start][:len(qvi.pi)], qvi.pi)
+    assert np.all(np.in1d(paths[np.arange(gym.n_states), (paths >= 0).sum(axis=1) - 1], 
+                          gym.terminal))
+
+def test_greedy_paths_loops():
+    """Test path extraction against sequential reference on random policies."""
+
+    gym = OpenField()
+    rng = np.random.RandomState(47404)
+    successors = rng.randint(gym.n_states, size=(3, gym.n_states))
+    paths = greedy_paths(gym, successors)
+
+    for k in range(3):
+        for s in gym.states:
+
+            ## Sequential reference.
+            policy = [s]
+            while not policy[-1] in gym.terminal and not successors[k,policy[-1]] in policy:
+                policy.append(successors[k,policy[-1]])
+
+            path = paths[k,s]
+            assert np.array_equal(path[path >= 0], policy)
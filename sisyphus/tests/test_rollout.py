@@ -0,0 +1,26 @@
+import numpy as np
+from scipy.stats import norm
+from sisyphus.envs import BART, OpenField
+from sisyphus.mdp import ValueIteration, rollout
+
+def test_rollout():
+    """Test batched Monte Carlo rollouts."""
+    np.random.seed(47404)
+
+    ## Greedy rollouts replicate the greedy policy.
+    gym = OpenField()
+    qvi = ValueIteration(policy='max', gamma=0.95).fit(gym, verbose=False)
+    states, actions, rewards, lengths = rollout(gym, qvi.Q, 10, choice='greedy', param=0)
+    assert np.all(states == states[0])
+    assert np.array_equal(states[0,:lengths[0]+1], qvi.pi)
+    assert np.array_equal(gym.S[actions[0,:lengths[0]]], qvi.pi[:-1])
+    assert np.allclose(rewards.sum(axis=1), 10)
+
+    ## Stochastic transitions follow outcome probabilities.
+    gym = BART(pumps=10, mu=8, sd=2)
+    Q = np.where(gym.S_prime[gym.o_ptr[:-1]] == gym.S + 1, 1, 0)   # Always pump
+    states, actions, rewards, lengths = rollout(gym, Q, 20000, choice='greedy', param=0)
+    popped = states[np.arange(20000), lengths] == gym.n_states - 1
+    assert np.all(np.in1d(states[np.arange(20000), lengths], gym.terminal))
+    assert np.all(actions[np.arange(states.shape[1] - 1) >= lengths[:,np.newaxis]] == -1)
+    assert np.abs(popped.mean() - (1 - np.prod(1 - norm(8,2).cdf(np.arange(9))))) < 0.02
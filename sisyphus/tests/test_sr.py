@@ -0,0 +1,63 @@
+import numpy as np
+from sisyphus.envs import DecisionTree, OpenField, SleepingPredator
+from sisyphus.mdp import ValueIteration, policy_matrix, successor_representation, occupancy
+from sisyphus.mdp import reward_features, successor_features
+
+def test_occupancy():
+    """Test exact state occupancy."""
+
+    ## Random choice in decision tree.
+    gym = DecisionTree()
+    Q = np.random.normal(0, 1, gym.n_actions)
+    d = occupancy(gym, Q, choice='softmax', param=0)
+    assert np.allclose(d, np.repeat([1, 1/2, 1/4, 1/8], [1, 2, 4, 8]))
+    assert np.allclose(d, occupancy(gym, Q, choice='softmax', param=0, method='iterative'))
+
+    ## Greedy choice in sleeping predator task (always approach).
+    gym = SleepingPredator(p=0.1)
+    Q = np.where(gym.S_prime[gym.o_ptr[:-1]] == gym.S + 1, 1, 0)
+    P, r = policy_matrix(gym, Q, choice='greedy', param=0)
+    assert np.allclose(P.sum(axis=1).A1, ~np.in1d(gym.states, gym.terminal))
+    d = occupancy(gym, Q, choice='greedy', param=0)
+    assert np.allclose(d[:7], 0.9 ** np.arange(7))
+    assert np.isclose(d[gym.terminal].sum(), 1)
+
+    ## Successor representation.
+    M = successor_representation(gym, Q, choice='greedy', param=0, gamma=0.9)
+    assert np.allclose(M[gym.start], occupancy(gym, Q, choice='greedy', param=0, gamma=0.9))
+    assert np.allclose(M @ r, r + 0.9 * P @ (M @ r))
+
+def test_successor_features():
+    """Test successor features and reward re-evaluation."""
+
+    ## Solve gym.
+    gym = OpenField()
+    qvi = ValueIteration(policy='max', gamma=0.95, tol=1e-10, max_iter=1000).fit(gym, verbose=False)
+
+    ## Greedy policy evaluation recovers solution.
+    features = reward_features(gym, gym.terminal)
+    assert np.array_equal(features @ [10, -10], gym.rewards)
+    sf = successor_features(gym, qvi.Q, choice='greedy', param=0, gamma=0.95, features=features)
+    assert np.allclose(sf.values([10, -10]), qvi.V)
+    assert np.allclose(sf.q_values([10, -10]), qvi.Q)
+
+    ## Reward sweeps share structure and cache.
+    other = gym.with_rewards(features @ [5, -3])
+    assert np.array_equal(other.rewards, OpenField(reward=5, punishment=-3).rewards)
+    assert other.S_prime is gym.S_prime
+    assert successor_features(other, qvi.Q, 'greedy', 0, 0.95, features) is sf
+    assert successor_features(other, qvi.Q.copy(), 'greedy', 0, 0.95, features) is sf
+    assert successor_features(other, qvi.Q, 'greedy', 0, 0.95, features[:,::-1]) is not sf
+
+    ## Cache keeps the most recently used results.
+    from sisyphus.mdp._sr import SF_CACHE_SIZE
+    for i in range(2 * SF_CACHE_SIZE):
+        successor_features(gym.with_rewards(features @ [i, -i]), qvi.Q, 'greedy', 0, 0.95)
+        assert successor_features(gym, qvi.Q, 'greedy', 0, 0.95, features) is sf
+    assert np.equal(len(gym._cache), SF_CACHE_SIZE)
+
+    ## Softmax policy evaluation matches successor representation.
+    M = successor_representation(other, qvi.Q, choice='softmax', param=2, gamma=0.9)
+    _, r = policy_matrix(other, qvi.Q, choice='softmax', param=2)
+    sf = successor_features(other, qvi.Q, choice='softmax', param=2, gamma=0.9, features=features)
+    assert np.allclose(sf.values([5, -3]), M @ r)
@@ -0,0 +1,45 @@
+import os
+import pytest
+import numpy as np
+from sisyphus.envs import BART
+from sisyphus.mdp import ModelFree, ValueIteration, run_sweep
+
+def test_sweep(tmp_path):
+    """Test parameter sweep runner."""
+    
+    ## Define sweep.
+    grid = dict(w=[1.0, 0.5], mu=[4, 6])
+    
+    ## Run value iteration sweep.
+    data = run_sweep(BART, ValueIteration(gamma=1.0), grid, fit_kws=dict(verbose=False))
+    assert np.array_equal(data.shape, [4, 6])
+    for _, row in data.iterrows():
+        qvi = ValueIteration(gamma=1.0, w=row.w).fit(BART(mu=row.mu), verbose=False)
+        assert np.array_equal(qvi.Q, row.Q)
+        assert np.array_equal(qvi.pi, row.pi)
+        
+    ## Run model-free sweep (serial / parallel).
+    agent = ModelFree(eta=0.2, gamma=1.0)
+    fit_kws = dict(choice='greedy', schedule=0.2 * np.ones(50))
+    np.random.seed(1)
+    state = np.random.get_state()[1].copy()
+    serial = run_sweep(BART, agent, grid, seed=0, fit_kws=fit_kws, path=str(tmp_path))
+    assert np.array_equal(np.random.get_state()[1], state)
+    parallel = run_sweep(BART, agent, grid, seed=0, fit_kws=fit_kws, n_jobs=2)
+    assert np.all([np.array_equal(q1, q2) for q1, q2 in zip(serial.Q, parallel.Q)])
+    
+    ## Resume partially completed sweep.
+    os.remove(os.path.join(str(tmp_path), 'job_000001.npz'))
+    resumed = run_sweep(BART, agent, grid, seed=0, fit_kws=fit_kws, path=str(tmp_path))
+    assert np.all([np.array_equal(q1, q2) for q1, q2 in zip(serial.Q, resumed.Q)])
+
+    ## Resume without restating the seed.
+    os.remove(os.path.join(str(tmp_path), 'job_000002.npz'))
+    resumed = run_sweep(BART, agent, grid, fit_kws=fit_kws, path=str(tmp_path))
+    assert np.all([np.array_equal(q1, q2) for q1, q2 in zip(serial.Q, resumed.Q)])
+
+    ## Check invalid sweeps.
+    with pytest.raises(ValueError):
+        run_sweep(BART, agent, grid, seed=1, fit_kws=fit_kws, path=str(tmp_path))
+    with pytest.raises(ValueError):
+        run_sweep(BART, agent, grid, fit_kws=fit_kws, path=str(tmp_path / 'new'))
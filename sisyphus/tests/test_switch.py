@@ -0,0 +1,25 @@
+import numpy as np
+from sisyphus.envs import BART
+from sisyphus.mdp import ValueIteration, switch_points
+
+def test_switch_points():
+    """Test bisection of policy switch points."""
+
+    ## Locate switch points of number of pumps.
+    gym = BART(pumps=20, mu=10, sd=3)
+    agent = ValueIteration(policy='pessimism', gamma=1.0, tol=1e-8, max_iter=1000, method='auto')
+    switches = switch_points(agent, gym, 'w', (0, 1), xtol=1e-3)
+    assert np.all(switches.upper - switches.lower <= 1e-3)
+    assert switches.attrs['n_fits'] < 100
+
+    ## Compare against dense grid.
+    ws = np.linspace(0, 1, 201)
+    pumps = [len(ValueIteration(policy='pessimism', gamma=1.0, w=w, tol=1e-8, max_iter=1000,
+                                method='auto').fit(gym).pi) for w in ws]
+    changes, = np.where(np.diff(pumps))
+    assert np.equal(len(switches), changes.size)
+    assert np.all(ws[changes] <= switches.upper) and np.all(switches.lower <= ws[changes+1])
+
+    ## Policies differ across each switch.
+    for _, row in switches.iterrows():
+        assert row.pi_lower != row.pi_upper
@@ -33,3 +33,41 @@ def test_model_free():
     assert np.allclose(agent.Q, [ 0.0,  1. , -1. ,  0. ,  0. ], atol=1e-3, rtol=0)
     assert np.allclose(agent.V, [ 0.0,  1. ,  0. ,  0. ], atol=1e-3, rtol=0)
     assert np.array_equal(agent.pi, np.arange(3))
+
+def test_backends():
+    """Test compiled and reference training converge to the same solution."""
+    np.random.seed(47404)
+
+    ## Generate test gym.
+    gym = GraphWorld(*test_world())
+
+    ## Iterate over choice rules and backends.
+    for choice, schedule in [('greedy', np.ones(100)), ('softmax', np.zeros(100))]:
+        for backend in ['compiled', 'reference']:
+            agent = ModelFree(policy='pessimism', eta=0.2, gamma=0.9, w=0.5, backend=backend)
+            agent, actions = agent.fit(gym, choice=choice, schedule=schedule, return_actions=True)
+            assert np.allclose(agent.Q, [ 0.0,  1. , -1. ,  0. ,  0. ], atol=1e-3, rtol=0)
+            assert np.equal(len(actions), 100)
+            assert np.all([len(a) == 2 for a in actions])
+
+def test_population():
+    """Test population training of independent agents."""
+    np.random.seed(47404)
+
+    ## Generate test gym.
+    gym = GraphWorld(*test_world())
+
+    ## Train population.
+    agent = ModelFree(policy='pessimism', eta=0.2, gamma=0.9, w=0.5)
+    agent, actions = agent.fit_population(gym, 20, choice='softmax', schedule=np.zeros(100), 
+                                          return_actions=True)
+    assert np.array_equal(agent.Q.shape, [20, 5])
+    assert np.allclose(agent.Q, [ 0.0,  1. , -1. ,  0. ,  0. ], atol=1e-3, rtol=0)
+    assert np.allclose(agent.V, [ 0.0,  1. ,  0. ,  0. ], atol=1e-3, rtol=0)
+    assert np.all([np.array_equal(pi, np.arange(3)) for pi in agent.pi])
+    
+    ## Test action bookkeeping (two choices per episode).
+    assert np.array_equal(actions.shape, [100, 20, 100])
+    assert np.all(actions[:,:,0] == 0)
+    assert np.all(np.in1d(actions[:,:,1], [1,2]))
+    assert np.all(actions[:,:,2:] == -1)
@@ -0,0 +1,39 @@
+import pytest
+import numpy as np
+from sisyphus.envs import DecisionTree, OpenField
+from sisyphus.mdp import ValueIteration, TreeSearch
+
+def test_tree_search():
+    """Test budgeted tree search with pruning."""
+
+    ## Generate test gym.
+    np.random.seed(0)
+    gym = DecisionTree(depth=6, branching=3, rewards=lambda n: np.random.choice([-70,-20,20,140], n))
+    n_internal = gym.terminal[0]
+
+    ## Exhaustive search is exact.
+    for order in ['depth', 'best']:
+        ref = ValueIteration(policy='pessimism', gamma=0.9, w=0.5, method='tree').fit(gym)
+        ts = TreeSearch(policy='pessimism', gamma=0.9, w=0.5, order=order).fit(gym)
+        assert np.equal(ts.n_expanded, n_internal)
+        assert np.allclose(ts.Q[:n_internal * 3], ref.Q[:n_internal * 3])
+        assert np.array_equal(ts.pi, ref.pi)
+
+    ## Budget limits number of expanded nodes.
+    for order in ['depth', 'best']:
+        ts = TreeSearch(budget=50, order=order).fit(gym)
+        assert np.equal(ts.n_expanded, 50)
+        assert np.equal(np.isnan(ts.V).sum(), gym.n_states - 50)
+
+    ## Large losses are never searched past with certain pruning.
+    ts = TreeSearch(threshold=-50, p_prune=1.0).fit(gym)
+    assert np.all(gym.node_rewards[ts.nodes[1:]] > -50)
+    assert ts.n_pruned > 0 and ts.n_expanded < n_internal
+
+    ## Test default tree (Huys et al., 2012).
+    ts = TreeSearch(p_prune=1.0).fit(DecisionTree())
+    assert np.array_equal(ts.pi, [0, 2, 5, 12])
+
+    ## Test other environments.
+    with pytest.raises(ValueError):
+        TreeSearch().fit(OpenField())